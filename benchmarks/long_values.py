@@ -0,0 +1,42 @@
+"""Measure the formatting of options spanning a large number of continuation lines.
+
+Such values are typically allow-lists, with one item per line. Usage:
+python benchmarks/long_values.py [NUMBER_OF_LINES]
+"""
+import functools
+import sys
+import timeit
+
+from config_formatter import ENGINES, ConfigFormatter
+
+
+def list_value(size: int) -> str:
+    return "[section]\nlist =\n" + "".join(f"  item{i}\n" for i in range(size))
+
+
+def aligned_value(size: int) -> str:
+    return "[section]\nkey = first\n" + "".join(f"      line {i}  \n" for i in range(size))
+
+
+def sparse_value(size: int) -> str:
+    return "[section]\nlist =\n" + "".join(f"  item{i}\n\n" for i in range(size // 2))
+
+
+VALUES = {"list": list_value, "aligned": aligned_value, "sparse": sparse_value}
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{'engine':<15}{'value':<10}{'time':>12}{'per line':>12}")
+    for engine in ENGINES:
+        formatter = ConfigFormatter(engine=engine)
+        for name, generate in VALUES.items():
+            config = generate(size)
+            timer = timeit.Timer(functools.partial(formatter.prettify, config))
+            number, _ = timer.autorange()
+            best = min(timer.repeat(repeat=5, number=number)) / number
+            print(f"{engine:<15}{name:<10}{best * 1e3:>9.1f} ms{best / size * 1e9:>9.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
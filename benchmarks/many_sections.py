@@ -0,0 +1,38 @@
+"""Measure the formatting of a single document made of many sections, serially and in parallel.
+
+The parallel formatting splits the document at section headers among a pool of processes. Usage:
+python benchmarks/many_sections.py [NUMBER_OF_SECTIONS]
+"""
+import os
+import sys
+import time
+
+from config_formatter import ConfigFormatter
+
+
+def many_sections(size: int) -> str:
+    return "".join(
+        f"[section{i}]\nkey{i}=value {i}\n  other :  x\nlist =\n  a\n   b\n# Comment.\n\n\n"
+        for i in range(size)
+    )
+
+
+def main() -> None:
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    config = many_sections(size)
+    print(f"{len(config) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+    print(f"{'workers':<10}{'time':>12}")
+    for workers in [None, 2, 4, 8]:
+        formatter = ConfigFormatter(
+            parallel_threshold=None if workers is None else 0, parallel_workers=workers
+        )
+        best = float("inf")
+        for _ in range(3):  # Too slow for "timeit", the pool of processes is created every time.
+            start = time.perf_counter()
+            formatter.prettify(config)
+            best = min(best, time.perf_counter() - start)
+        print(f"{workers or 'serial':<10}{best * 1e3:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Benchmark the formatting of synthetic configurations of various shapes.
+
+Each shape is formatted by both engines. For the "configupdater" engine, the parsing done by
+"_load_config()" and the formatting done by "_format_config()" are also timed separately. The
+native engine formats while parsing, so only its end-to-end time is reported.
+
+Usage:
+    python benchmarks/run.py          # Compare the timings with the stored baseline.
+    python benchmarks/run.py --save   # Store the timings as the new baseline.
+
+Timings depend on the machine, so the baseline must be generated on the machine used to compare.
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import timeit
+from typing import Callable, Dict, Sequence
+
+from config_formatter import ENGINES, ConfigFormatter
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def many_tiny_sections(size: int) -> str:
+    return "".join(f"[section{i}]\nkey={i}\n\n" for i in range(size // 3))
+
+
+def huge_single_section(size: int) -> str:
+    return "[section]\n" + "".join(f"key{i}=value{i}\n" for i in range(size))
+
+
+def already_formatted(size: int) -> str:
+    return "[section]\n" + "".join(f"key{i} = value{i}\n" for i in range(size))
+
+
+def long_list_values(size: int) -> str:
+    return "".join(f"[section{i}]\nlist =\n" + "   item\n" * 100 for i in range(size // 100))
+
+
+def comment_heavy(size: int) -> str:
+    return "".join(
+        f"# Comment {i}.\n  ; Indented comment {i}.\n[section{i}]  # Inline.\nkey={i}\n"
+        for i in range(size // 4)
+    )
+
+
+def sectionless(size: int) -> str:
+    return "# Header.\n\n" + "".join(f"key{i}: value{i}\n" for i in range(size))
+
+
+def deep_continuations(size: int) -> str:
+    block = "".join(f"{' ' * (4 + depth)}level {depth}\n" for depth in range(50))
+    return "".join(f"[section{i}]\nkey = value\n{block}" for i in range(size // 50))
+
+
+SHAPES = {
+    "many_tiny_sections": many_tiny_sections,
+    "huge_single_section": huge_single_section,
+    "already_formatted": already_formatted,
+    "long_list_values": long_list_values,
+    "comment_heavy": comment_heavy,
+    "sectionless": sectionless,
+    "deep_continuations": deep_continuations,
+}
+
+
+def measure(function: Callable[[], object], repeat: int) -> float:
+    """Return the best time of a single call over several repetitions, in seconds.
+
+    Each repetition calls the function enough times to last at least 0.2 seconds.
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def format_document(formatter: ConfigFormatter, document, has_dummy_top_section: bool) -> str:
+    return "".join(formatter._format_config(document, has_dummy_top_section=has_dummy_top_section))
+
+
+def run_benchmarks(size: int, repeat: int, engines: Sequence[str]) -> Dict[str, float]:
+    results = {}
+    for shape, generate in SHAPES.items():
+        config = generate(size)
+        for engine in engines:
+            formatter = ConfigFormatter(engine=engine)
+            key = f"{shape}/{engine}"
+            if engine == "configupdater":
+                string = config.strip()
+                document, has_dummy = formatter._load_config(string)
+                load = functools.partial(formatter._load_config, string)
+                format_ = functools.partial(format_document, formatter, document, has_dummy)
+                results[f"{key}/load"] = measure(load, repeat)
+                results[f"{key}/format"] = measure(format_, repeat)
+            prettify = functools.partial(formatter.prettify, config)
+            results[f"{key}/prettify"] = measure(prettify, repeat)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="Store the timings as the baseline.")
+    parser.add_argument("--size", type=int, default=1000, help="Number of lines of each shape.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed repetitions.")
+    parser.add_argument(
+        "--engine", choices=ENGINES, action="append", help="Engine to benchmark (default: all)."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Relative slowdown above which a timing is reported as a regression.",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.size, args.repeat, args.engine or ENGINES)
+
+    if args.save:
+        stored = {"size": args.size, "results": results}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH) as file:
+                data = json.load(file)
+            if data["size"] == args.size:
+                stored["results"] = dict(data["results"], **results)
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(stored, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+    baseline = {}  # type: Dict[str, float]
+    if not args.save and os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as file:
+            data = json.load(file)
+        if data["size"] == args.size:
+            baseline = data["results"]
+        else:
+            print(f"warning: baseline size is {data['size']}, not comparing", file=sys.stderr)
+
+    regressions = 0
+    print(f"{'benchmark':<50}{'time':>12}{'baseline':>12}{'ratio':>8}")
+    for key, duration in results.items():
+        line = f"{key:<50}{duration * 1e3:>9.2f} ms"
+        if key in baseline:
+            ratio = duration / baseline[key]
+            line += f"{baseline[key] * 1e3:>9.2f} ms{ratio:>8.2f}"
+            if ratio > 1 + args.tolerance:
+                line += "  REGRESSION"
+                regressions += 1
+        print(line)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Measure the per-call overhead of formatting tiny configurations with each engine.
+
+The native engine only relies on precompiled module-level patterns, so it has nothing to set up per
+call. The "configupdater" engine needs a new parser for each configuration, since a parser keeps
+the sections it has read: the cost of creating it is reported separately.
+Usage: python benchmarks/tiny_inputs.py [NUMBER_OF_CALLS]
+"""
+import functools
+import sys
+import timeit
+
+import configupdater.parser
+
+from config_formatter import _PARSER_OPTIONS, ENGINES, ConfigFormatter
+
+# None of them is already formatted, so that they are not returned as is without being parsed.
+CONFIGS = {
+    "option": "key=value",
+    "section": "[section]\nkey=value\n",
+    "list": "[section]\nkey = value\nlist =\n  a\n  b\n",
+}
+
+
+def measure(function, number: int) -> float:
+    """Return the best time per call over several repetitions, in microseconds."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    formatters = [ConfigFormatter(engine=engine) for engine in ENGINES]
+    print(f"{'config':<10}" + "".join(f"{engine:>18}" for engine in ENGINES))
+    for name, config in CONFIGS.items():
+        timings = [measure(functools.partial(f.prettify, config), number) for f in formatters]
+        print(f"{name:<10}" + "".join(f"{timing:>15.2f} us" for timing in timings))
+    setup = measure(functools.partial(configupdater.parser.Parser, **_PARSER_OPTIONS), number)
+    print(f"\nconfigupdater parser creation: {setup:.2f} us per configuration")
+
+
+if __name__ == "__main__":
+    main()
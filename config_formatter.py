@@ -1,17 +1,319 @@
 """The `config-parser` module provides utilities to format .ini and .cfg files."""
-from typing import Tuple
+import codecs
+import collections
+import configparser
+import contextlib
+import functools
+import hashlib
+import io
+import itertools
+import operator
+import os
+import re
+import sys
+import threading
+import time
+from configparser import DuplicateOptionError, DuplicateSectionError, ParsingError
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
 
-import configupdater
-import configupdater.builder
-import configupdater.container
-import configupdater.parser
+if TYPE_CHECKING:  # pragma: no cover
+    import concurrent.futures
+
+    import configupdater.container
+    import configupdater.parser
 
 __version__ = "1.2.0"
-__all__ = ["ConfigFormatter"]
+__all__ = [
+    "ConfigBlock",
+    "ConfigDocument",
+    "ConfigFormatter",
+    "FormattingCache",
+    "FormattingStats",
+    "TextEdit",
+    "VerificationError",
+]
+
+ENGINES = ("native", "configupdater")
+
+# These mirror the regular expressions of "configupdater.parser.Parser" for the settings we use.
+_SECTION_REGEX = re.compile(r"\[(?P<header>.+)\](?P<raw_comment>.*)")
+_OPTION_REGEX = re.compile(r"(?P<option>.*?)\s*(?P<vi>=|:)\s*(?P<value>.*)$")
+_COMMENT_PREFIXES = ("#", ";")
+# The settings given to a new "configupdater.parser.Parser" for each configuration.
+_PARSER_OPTIONS = {
+    "strict": True,
+    "delimiters": ("=", ":"),
+    "comment_prefixes": _COMMENT_PREFIXES,
+    "inline_comment_prefixes": None,
+    "allow_no_value": False,
+    "empty_lines_in_values": True,
+}
+
+_NON_SPACE_REGEX = re.compile(r"\S")
+_CANONICAL_OPTION_REGEX = re.compile(
+    r"(?P<option>[^=:\s](?:[^=:]*[^=:\s])?) =(?P<value> \S(?:.*\S)?)?"
+)
+_LINE_BREAK_REGEX = re.compile("[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+_FORMATTED_SECTION_REGEX = re.compile(r"^\[.*$", re.MULTILINE)
+_DUMMY_SECTION_REGEX = re.compile(r"\[config-formatter-dummy-section-name-([0-9]+)\]")
+
+_COMMENT = 0
+_SPACE = 1
+_SECTION = 2
+_OPTION = 3
+
+_BLOCK_NAMES = {_SECTION: "section", _OPTION: "option", _COMMENT: "comment", _SPACE: "space"}
+_BLOCK_RANGE = operator.itemgetter(1, 2)
+_BLOCK_TEXT = operator.itemgetter(3)
+
+DEFAULT_CACHE_SIZE = 100000
+
+DEFAULT_INLINE_THRESHOLD = 4096
+
+# Used by the command-line tool, which guards its entry point as required by "multiprocessing".
+DEFAULT_PARALLEL_THRESHOLD = 4 * 1024 * 1024
+
+FILE_BUFFER_SIZE = 1024 * 1024
+
+_LINE_COUNT_BLOCK_SIZE = 64 * 1024
+
+# Checked in this order, as the UTF-32 LE mark starts with the UTF-16 LE one.
+_BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+class TextEdit(NamedTuple):
+    """The replacement of the characters between the "start" and "end" offsets of a string."""
+
+    start: int
+    end: int
+    text: str
+
+
+class VerificationError(configparser.Error):
+    """Raised in "verify" mode when the output is not semantically identical to the input."""
+
+
+@functools.lru_cache(maxsize=None)
+def _indentation(width: int) -> str:
+    """Return the indentation of continuation lines of the given width."""
+    return " " * width
+
+
+class ConfigBlock:
+    """A block of a formatted configuration, as found in a "ConfigDocument".
+
+    The attributes are:
+        - "kind": the type of the block, one of "section", "option", "comment" or "space" ;
+        - "first_lineno" and "last_lineno": the numbers of the first and last source lines ;
+        - "section": the name of the section it belongs to, or None before the first header ;
+        - "name": the name of the section or of the option, None for comments and spaces ;
+        - "text": its formatted lines.
+    """
+
+    __slots__ = ("kind", "first_lineno", "last_lineno", "section", "name", "text")
+
+    def __init__(
+        self,
+        kind: str,
+        first_lineno: int,
+        last_lineno: int,
+        section: Optional[str],
+        name: Optional[str],
+        text: str,
+    ) -> None:
+        self.kind = kind
+        self.first_lineno = first_lineno
+        self.last_lineno = last_lineno
+        self.section = section
+        self.name = name
+        self.text = text
+
+    def __repr__(self) -> str:
+        return (
+            f"ConfigBlock({self.kind!r}, {self.first_lineno}, {self.last_lineno}, "
+            f"{self.section!r}, {self.name!r}, {self.text!r})"
+        )
+
+    @property
+    def value(self) -> Optional[str]:
+        """The value of the option as "configparser" returns it, None for other blocks.
+
+        It is also None for indented options which "configparser" takes for comments, because their
+        name starts with a comment prefix.
+        """
+        if self.kind != "option":
+            return None
+        reader = _SemanticReader()
+        reader.feed_many(self.text.split("\n"))
+        reader.close()
+        return reader.events[0][2] if reader.events else None
+
+
+class ConfigDocument:
+    """A configuration parsed by "ConfigFormatter.parse()", as the flat sequence of its blocks.
+
+    Each block holds its formatted text, so that rendering the document doesn't require any more
+    work. Sections and options are looked up by scanning the blocks.
+    """
+
+    __slots__ = ("blocks",)
+
+    def __init__(self, blocks: List[ConfigBlock]) -> None:
+        self.blocks = blocks
+
+    def __iter__(self) -> Iterator[ConfigBlock]:
+        return iter(self.blocks)
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def __repr__(self) -> str:
+        return f"<ConfigDocument of {len(self.blocks)} blocks>"
+
+    def sections(self) -> List[str]:
+        """Return the names of the sections, in order."""
+        return [block.name for block in self.blocks if block.kind == "section"]
+
+    def options(self, section: Optional[str]) -> List[str]:
+        """Return the names of the options of the section (None for those preceding any header)."""
+        if section is not None and section not in self.sections():
+            raise configparser.NoSectionError(section)
+        return [
+            block.name
+            for block in self.blocks
+            if block.kind == "option" and block.section == section
+        ]
+
+    def get(self, section: Optional[str], option: str) -> str:
+        """Return the value of the option, compared case-insensitively as "configparser" does."""
+        option = option.lower()
+        for block in self.blocks:
+            if block.kind == "option" and block.section == section and block.name.lower() == option:
+                return block.value
+        if section is not None and section not in self.sections():
+            raise configparser.NoSectionError(section)
+        raise configparser.NoOptionError(option, section)
+
+    def render(self) -> str:
+        """Concatenate the formatted blocks, giving the output of "ConfigFormatter.prettify()"."""
+        return "".join(block.text for block in self.blocks)
 
 
 class ConfigFormatter:
-    """A class used to reformat .ini/.cfg configurations."""
+    """A class used to reformat .ini/.cfg configurations.
+
+    Two engines are available and produce the exact same output:
+        - "native" (default): a line-oriented tokenizer formatting the input in a single pass ;
+        - "configupdater": the reference implementation, building a full document tree first.
+
+    If a "FormattingCache" is provided, configurations it knows to be already formatted are
+    returned as is by "prettify()", without being parsed. It is up to the caller to save the cache.
+
+    A formatter can safely be shared between threads. The "configupdater" engine creates a new
+    parser for each configuration, as a parser holds the state of the configuration it reads.
+
+    The asynchronous methods format configurations of at least "inline_threshold" characters in a
+    pool of at most "max_workers" threads, created on first use and shut down by "close()".
+
+    If a "FormattingStats" is provided, statistics about the formatted configurations are recorded
+    into it.
+
+    If "verify" is set, the sections and options of each configuration are read as "configparser"
+    would read them, from the input and from the output while it is generated. A
+    "VerificationError" is raised as soon as they differ.
+
+    If "parallel_threshold" is set, configurations of at least that many characters are split into
+    chunks of sections formatted by a pool of "parallel_workers" processes (by default, the number
+    of CPUs) when "prettify()" is called while no other thread is running. It is disabled by
+    default, as starting processes requires the main module of the program to be importable on
+    platforms using the "spawn" start method (see "DEFAULT_PARALLEL_THRESHOLD", used by the
+    command-line tool).
+    """
+
+    def __init__(
+        self,
+        *,
+        engine: str = "native",
+        cache: Optional["FormattingCache"] = None,
+        max_workers: Optional[int] = None,
+        inline_threshold: int = DEFAULT_INLINE_THRESHOLD,
+        stats: Optional["FormattingStats"] = None,
+        verify: bool = False,
+        parallel_threshold: Optional[int] = None,
+        parallel_workers: Optional[int] = None,
+    ) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Invalid engine '{engine}', expected one of: {', '.join(ENGINES)}")
+        if max_workers is not None and max_workers < 1:
+            raise ValueError(
+                f"Invalid number of workers: {max_workers}, expected a positive integer"
+            )
+        if inline_threshold < 0:
+            raise ValueError(
+                f"Invalid inline threshold: {inline_threshold}, expected a non-negative integer"
+            )
+        if parallel_threshold is not None and parallel_threshold < 0:
+            raise ValueError(
+                f"Invalid parallel threshold: {parallel_threshold}, expected a non-negative integer"
+            )
+        if parallel_workers is not None and parallel_workers < 1:
+            raise ValueError(
+                f"Invalid number of workers: {parallel_workers}, expected a positive integer"
+            )
+        self._engine = engine
+        self._cache = cache
+        self._max_workers = max_workers
+        self._inline_threshold = inline_threshold
+        self._stats = stats
+        self._verify = verify
+        self._parallel_threshold = parallel_threshold
+        self._parallel_workers = parallel_workers
+        self._executor = None  # type: Optional[concurrent.futures.ThreadPoolExecutor]
+        self._executor_lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # Threads can't be pickled, they're created again on use.
+        state = self.__dict__.copy()
+        del state["_executor_lock"]
+        state["_executor"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._executor_lock = threading.Lock()
+
+    @property
+    def engine(self) -> str:
+        """The name of the engine used to parse and format configurations."""
+        return self._engine
+
+    @property
+    def verify(self) -> bool:
+        """Whether the output is checked to be semantically identical to the input."""
+        return self._verify
+
+    @property
+    def stats(self) -> Optional["FormattingStats"]:
+        """The statistics recorded by the formatter, if any."""
+        return self._stats
 
     def prettify(self, string: str) -> str:
         """Transform the content of a .ini/.cfg file to make it more pleasing to the eye.
@@ -28,87 +330,1800 @@ class ConfigFormatter:
             - empty lines in values are allowed but discouraged.
 
         These settings are those used by default in the "ConfigParser" from the standard library.
+
+        Configurations already formatted are recognized by a quick scan of their lines and returned
+        as is, without being parsed nor rebuilt. Large ones may be formatted in parallel, see
+        "_prettify_parallel()".
+        """
+        if self._cache is None:
+            if self._stats is None and self._is_canonical(string):
+                return string
+            return self._format_string(string)
+
+        digest = self.cache_key(string)
+        if digest in self._cache:
+            return string
+        if self._stats is None and self._is_canonical(string):
+            self._cache.add(digest)
+            return string
+        formatted = self._format_string(string)
+        if formatted == string:
+            self._cache.add(digest)
+        return formatted
+
+    def is_formatted(self, string: str) -> bool:
+        """Check whether the content of a .ini/.cfg file is already formatted.
+
+        See "check()" for details.
+        """
+        return self.check(string) is None
+
+    def check(self, string: str) -> Optional[int]:
+        """Find the first line of a .ini/.cfg file that differs from its formatted version.
+
+        The formatted output is generated line by line and compared with the input on the fly,
+        stopping at the first difference. The output is thus never built entirely, and the
+        configuration is not parsed any further. Consequently, a syntax error following the first
+        difference may not be reported.
+
+        It returns the line number (starting at 1) of the first difference, or "None" if the
+        content is already formatted.
+        """
+        if self._cache is None:
+            return self._find_difference(string)
+
+        digest = self.cache_key(string)
+        if digest in self._cache:
+            return None
+        lineno = self._find_difference(string)
+        if lineno is None:
+            self._cache.add(digest)
+        return lineno
+
+    def cache_key(self, string: str) -> str:
+        """Compute the key under which a "FormattingCache" records the string as formatted.
+
+        The key depends on the version of this module and on the engine of the formatter, so that
+        a configuration formatted by one of them is formatted again by the others.
+        """
+        hasher = hashlib.sha256(f"{__version__}\0{self._engine}\0".encode("utf-8"))
+        hasher.update(string.encode("utf-8", "surrogatepass"))
+        return hasher.hexdigest()
+
+    async def aprettify(self, string: str) -> str:
+        """Format the content of a .ini/.cfg file without blocking the running event loop.
+
+        Configurations shorter than the inline threshold of the formatter are formatted directly,
+        as handing them over to another thread would take longer. Larger ones are formatted by the
+        thread pool of the formatter, which bounds the number of configurations being formatted
+        concurrently. See "prettify()" for details.
         """
+        if len(string) < self._inline_threshold:
+            return self.prettify(string)
+
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._get_executor(), self.prettify, string)
+
+    async def aprettify_many(self, strings: Iterable[str]) -> List[Union[str, Exception]]:
+        """Format the content of several .ini/.cfg files without blocking the running event loop.
+
+        Outputs are returned in the same order as the inputs. As with "prettify_many()", the
+        exception raised while formatting an invalid configuration is returned in place of its
+        output. See "aprettify()" for details.
+        """
+        import asyncio
+
+        return list(await asyncio.gather(*(self._aprettify_or_error(s) for s in strings)))
+
+    async def _aprettify_or_error(self, string: str) -> Union[str, Exception]:
+        """Format the string asynchronously, returning the exception raised if it is invalid.
+
+        See "_prettify_or_error()" for details.
+        """
+        try:
+            return await self.aprettify(string)
+        except Exception as error:
+            return error
+
+    def close(self) -> None:
+        """Shut down the threads used by the asynchronous methods, waiting for pending tasks."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _get_executor(self) -> "concurrent.futures.ThreadPoolExecutor":
+        """Get the pool of threads used by the asynchronous methods, creating it on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                import concurrent.futures
+
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self._max_workers, thread_name_prefix="config-formatter"
+                )
+            return self._executor
+
+    def prettify_to(self, string: str, stream: TextIO) -> None:
+        """Format the content of a .ini/.cfg file and write the result to the given text stream.
+
+        The output is identical to the one of "prettify()", but it is written piece by piece instead
+        of being assembled in memory first. If the configuration is invalid, the exception may be
+        raised while part of the output has already been written.
+        """
+        stream.writelines(self._iter_prettify(string))
+
+    def prettify_many(
+        self, strings: Iterable[str], *, workers: Optional[int] = None
+    ) -> List[Union[str, Exception]]:
+        """Format the content of several .ini/.cfg files, returning the outputs in the same order.
+
+        An invalid configuration does not abort the whole batch: the exception raised while
+        formatting it is returned in place of its output.
+
+        By default, configurations are formatted in the current process, by this formatter. If
+        "workers" is greater than one, they are distributed in chunks to a pool of as many
+        processes. In such case, the cache of the formatter (if any) is only consulted and updated
+        by the current process, and the statistics recorded by each process are merged into those
+        of the formatter (if any).
+        """
+        if workers is not None and workers < 1:
+            raise ValueError(f"Invalid number of workers: {workers}, expected a positive integer")
+
+        strings = list(strings)
+
+        if workers is None or workers == 1:
+            return [_prettify_or_error(self, string) for string in strings]
+
+        results = list(strings)  # type: List[Union[str, Exception]]
+        digests = [None] * len(strings)  # type: List[Optional[str]]
+        pending = list(range(len(strings)))
+
+        if self._cache is not None:
+            for i, string in enumerate(strings):
+                digests[i] = self.cache_key(string)
+            pending = [i for i in pending if digests[i] not in self._cache]
+
+        formatter = ConfigFormatter(engine=self._engine, verify=self._verify)
+        pending_strings = [strings[i] for i in pending]
+        if self._stats is None:
+            function = functools.partial(_prettify_or_error, formatter)
+            outputs = run_jobs(function, pending_strings, jobs=workers)
+        else:
+            function = functools.partial(_prettify_recording_stats, formatter)
+            outputs = []
+            for output, stats in run_jobs(function, pending_strings, jobs=workers):
+                self._stats.merge(stats)
+                outputs.append(output)
+
+        for i, output in zip(pending, outputs):
+            results[i] = output
+            if self._cache is not None and output == strings[i]:
+                self._cache.add(digests[i])
+
+        return results
+
+    def iter_prettify(self, lines: Iterable[str]) -> Iterator[str]:
+        """Format the lines of a .ini/.cfg file and generate the formatted result line by line.
+
+        The lines can be any iterable of strings, such as a text file object. Each of them must
+        consist of a single line, the trailing newline character being optional. The concatenated
+        output is identical to the one of "prettify()".
+
+        With the "native" engine, lines are consumed lazily and each formatted line is generated as
+        soon as the block it belongs to is complete. Memory usage is therefore bounded by the size
+        of the largest multi-line value rather than by the size of the whole configuration, apart
+        from the section names kept to detect duplicates. The "configupdater" engine needs to read
+        all lines before generating anything.
+        """
+        if self._verify:
+            yield from self._iter_verified(lines)
+        elif self._engine != "native":
+            yield from self._iter_formatted(self._join_lines(lines))
+        else:
+            yield from self._iter_native_stream(lines)
+
+    def _join_lines(self, lines: Iterable[str]) -> str:
+        """Concatenate the lines, with or without their trailing newline characters."""
+        return "\n".join(line[:-1] if line.endswith("\n") else line for line in lines)
+
+    def _iter_native_stream(self, lines: Iterable[str]) -> Iterator[str]:
+        """Format the lines with the native engine, consuming them lazily."""
+        stripped_lines = self._strip_lines(lines)
+        first_line = next(stripped_lines, None)
+        if first_line is None:
+            yield "\n"
+            return
+        yield from self._iter_native(itertools.chain((first_line,), stripped_lines))
+
+    def prettify_stream(self, infile: Iterable[str], outfile: TextIO) -> None:
+        """Format the lines read from the input file and write the result to the output file.
+
+        See "iter_prettify()" for details. If the configuration is invalid, the exception may be
+        raised while part of the output has already been written.
+        """
+        outfile.writelines(self.iter_prettify(infile))
+
+    def prettify_file(self, path: str, target: Optional[str] = None) -> bool:
+        """Format the .ini/.cfg file at the given path, and write the result to the target file.
+
+        By default, the file is formatted in place: it is replaced atomically, and only if its
+        content changes. Otherwise, the target file is always written. Return whether the formatted
+        content differs from the original one.
+
+        The file is read and written incrementally through buffers of "FILE_BUFFER_SIZE" bytes, see
+        "iter_prettify()" for details. With the "native" engine, memory usage therefore does not
+        depend on the size of the file (but on the number of sections), making it suitable for very
+        large configurations.
+
+        The file is decoded as UTF-8, unless it starts with a byte order mark identifying UTF-8,
+        UTF-16 or UTF-32. The result is encoded the same way, including the byte order mark. Any
+        kind of newline is accepted and the result uses "\n", but a file differing from its
+        formatted content only by its newlines is considered unchanged.
+        """
+        tracker = _ChangeTracker()
+        with open(path, "rb", buffering=FILE_BUFFER_SIZE) as binary_file:
+            mark, encoding = detect_encoding(binary_file.peek(4)[:4])
+            binary_file.seek(len(mark))
+            infile = io.TextIOWrapper(binary_file, encoding=encoding, newline=None)
+            fragments = tracker.compare(self.iter_prettify(tracker.read(infile)))
+            try:
+                with _open_atomically(target or path, encoding=encoding) as outfile:
+                    if mark:
+                        outfile.write("\ufeff")
+                    outfile.writelines(fragments)
+                    infile.close()  # The file can't be replaced while open on Windows.
+                    if not tracker.close() and target is None:
+                        raise _DiscardFile
+            except _DiscardFile:
+                pass
+        return tracker.changed
+
+    def parse(self, string: str) -> ConfigDocument:
+        """Parse the content of a .ini/.cfg file into a "ConfigDocument" of formatted blocks.
+
+        Consecutive comment lines make up a single block. Blank lines surrounding the configuration
+        are not part of any block, unless the configuration is empty. Rendering the document gives
+        the output of "prettify()".
+
+        The native tokenizer is used whatever the engine of the formatter.
+        """
+        first_content = _NON_SPACE_REGEX.search(string)
+        if first_content is None:
+            last_lineno = string.count("\n") + 1
+            return ConfigDocument([ConfigBlock("space", 1, last_lineno, None, None, "\n")])
+
+        first_lineno = string.count("\n", 0, first_content.start()) + 1
+        units = self._iter_native_blocks(string.strip().split("\n"), first_lineno)
+        blocks = []  # type: List[ConfigBlock]
+        texts = []  # type: List[List[str]]
+        section = None  # type: Optional[str]
+        previous_kind, previous_first = None, None
+
+        for kind, first, last, text in units:
+            if kind == previous_kind and (kind == _COMMENT or first == previous_first):
+                blocks[-1].last_lineno = last
+                texts[-1].append(text)
+                continue
+            previous_kind, previous_first = kind, first
+            name = None
+            if kind == _SECTION:
+                section = name = _SECTION_REGEX.match(text).group("header")
+            elif kind == _OPTION:
+                name = text.partition(" =")[0]
+            blocks.append(ConfigBlock(_BLOCK_NAMES[kind], first, last, section, name, ""))
+            texts.append([text])
+
+        for block, lines in zip(blocks, texts):
+            block.text = "".join(lines)
+
+        return ConfigDocument(blocks)
+
+    def prettify_edits(self, string: str) -> List[TextEdit]:
+        """Compute the edits turning the content of a .ini/.cfg file into its formatted version.
+
+        With the "native" engine, the edits are derived from the source lines each formatted block
+        originates from, so that no generic diff algorithm needs to be run. The "configupdater"
+        engine doesn't keep track of these lines: the output of "prettify()" is then compared with
+        the content using "difflib". The edits replace whole lines, they are sorted and they don't
+        overlap. Applying them to the string gives the output of "prettify()", and no edit is
+        returned if the content is already formatted. In "verify" mode, a "VerificationError" is
+        raised if the output is not semantically identical to the input.
+        """
+        lines = _split_lines(string)
+        offsets = list(itertools.accumulate([0] + [len(line) for line in lines]))
+        return [
+            TextEdit(offsets[start], offsets[end], "".join(new_lines))
+            for start, end, new_lines in self._iter_line_changes(string, lines)
+        ]
+
+    def prettify_diff(self, string: str, fromfile: str = "", tofile: str = "") -> str:
+        """Compute the unified diff between a .ini/.cfg file content and its formatted version.
+
+        The diff uses the format of "difflib.unified_diff()" with three lines of context. It is
+        empty if the content is already formatted. See "prettify_edits()" for details.
+        """
+        lines = _split_lines(string)
+        changes = list(self._iter_line_changes(string, lines))
+        if not changes:
+            return ""
+        return "".join(self._iter_unified_diff(lines, changes, fromfile, tofile))
+
+    def _iter_line_changes(
+        self, string: str, lines: List[str]
+    ) -> Iterator[Tuple[int, int, List[str]]]:
+        """Generate the changes replacing the "lines[start:end]" of the string by new lines.
+
+        Each formatted block is compared with the source lines it spans. Source lines that don't
+        belong to any block (blank lines surrounding the configuration) are removed. Blocks whose
+        number of lines is preserved are compared line by line. Adjacent changes are merged.
+        """
+        if self._engine != "native":
+            yield from self._iter_compared_lines(lines, _split_lines(self.prettify(string)))
+            return
+
+        first_content = _NON_SPACE_REGEX.search(string)
+        if first_content is None:
+            blocks = [(1, len(lines), ["\n"])]  # type: Iterable[Tuple[int, int, List[str]]]
+            if self._stats is not None:
+                self._stats._record(len(string), {}, collections.Counter(), False)
+        else:
+            first_lineno = string.count("\n", 0, first_content.start()) + 1
+            if self._stats is not None:
+                native_blocks = self._tokenize_with_stats(string, lines, first_lineno)
+            else:
+                native_blocks = self._iter_native_blocks(string.strip().split("\n"), first_lineno)
+                if self._verify:
+                    native_blocks = self._iter_verified_blocks(lines, native_blocks)
+            blocks = (
+                (first, last, [text for _, _, _, text in group])
+                for (first, last), group in itertools.groupby(native_blocks, key=_BLOCK_RANGE)
+            )
+
+        pending = None  # type: Optional[Tuple[int, int, List[str]]]
+        position = 0
+
+        for first, last, new_lines in itertools.chain(blocks, [(len(lines) + 1, None, [])]):
+            start = first - 1
+            changes = [(position, start, [])]
+            if last is not None:
+                old_lines = lines[start:last]
+                if len(old_lines) != len(new_lines):
+                    changes.append((start, last, new_lines))
+                elif old_lines != new_lines:
+                    changes.extend(
+                        (start + i, start + i + 1, [new_line])
+                        for i, (old_line, new_line) in enumerate(zip(old_lines, new_lines))
+                        if old_line != new_line
+                    )
+                position = last
+
+            for change in changes:
+                if change[0] == change[1] and not change[2]:
+                    continue
+                if pending is not None and pending[1] == change[0]:
+                    pending = (pending[0], change[1], pending[2] + change[2])
+                    continue
+                if pending is not None:
+                    yield pending
+                pending = change
+
+        if pending is not None:
+            yield pending
+
+    def _iter_compared_lines(
+        self, lines: List[str], new_lines: List[str]
+    ) -> Iterator[Tuple[int, int, List[str]]]:
+        """Generate the changes replacing the "lines[start:end]" by new lines, using "difflib"."""
+        import difflib
+
+        matcher = difflib.SequenceMatcher(None, lines, new_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != "equal":
+                yield i1, i2, new_lines[j1:j2]
+
+    def _tokenize_with_stats(
+        self, string: str, lines: List[str], first_lineno: int
+    ) -> Iterable[Tuple[int, int, int, str]]:
+        """Tokenize the string with the native engine, recording statistics.
+
+        See "_prettify_with_stats()", the blocks are verified beforehand in "verify" mode so that
+        only the configurations formatted successfully are accounted.
+        """
+        timings = {}
+        blocks = collections.Counter()  # type: collections.Counter
+
+        start = time.perf_counter()
+        stripped_lines = string.strip().split("\n")
+        timings["strip"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        native_blocks = list(self._iter_native_blocks(stripped_lines, first_lineno))
+        timings["tokenize"] = time.perf_counter() - start
+        fallback = _count_native_blocks(native_blocks, blocks)
+
+        if self._verify:
+            start = time.perf_counter()
+            collections.deque(self._iter_verified_blocks(lines, native_blocks), maxlen=0)
+            timings["verify"] = time.perf_counter() - start
+
+        self._stats._record(len(string), timings, blocks, fallback)
+        return native_blocks
+
+    def _iter_verified_blocks(
+        self, lines: List[str], blocks: Iterable[Tuple[int, int, int, str]]
+    ) -> Iterator[Tuple[int, int, int, str]]:
+        """Generate the native blocks, checking their semantic equivalence with the source lines.
+
+        See "_iter_verified()", the source being entirely available, it is read beforehand.
+        """
+        source, output = _SemanticReader(), _SemanticReader()
+        source.feed_many(lines)
+        source.close()
+        for block in blocks:
+            output.feed(block[3])
+            if output.events:
+                _compare_semantics(source, output)
+            yield block
+        output.close()
+        _compare_semantics(source, output, complete=True)
+
+    def _iter_unified_diff(
+        self,
+        lines: List[str],
+        changes: List[Tuple[int, int, List[str]]],
+        fromfile: str,
+        tofile: str,
+        context: int = 3,
+    ) -> Iterator[str]:
+        """Generate the lines of the unified diff corresponding to the sorted line changes."""
+        yield f"--- {fromfile}\n"
+        yield f"+++ {tofile}\n"
+
+        groups = [[changes[0]]]
+        for change in changes[1:]:
+            if change[0] - groups[-1][-1][1] > 2 * context:
+                groups.append([change])
+            else:
+                groups[-1].append(change)
+
+        offset = 0
+        for group in groups:
+            old_start = max(group[0][0] - context, 0)
+            old_end = min(group[-1][1] + context, len(lines))
+            new_start = old_start + offset
+            offset += sum(len(new_lines) - (end - start) for start, end, new_lines in group)
+            new_end = old_end + offset
+            old_range = self._format_diff_range(old_start, old_end)
+            new_range = self._format_diff_range(new_start, new_end)
+            yield f"@@ -{old_range} +{new_range} @@\n"
+
+            position = old_start
+            for start, end, new_lines in group:
+                for line in lines[position:start]:
+                    yield from self._format_diff_line(" ", line)
+                for line in lines[start:end]:
+                    yield from self._format_diff_line("-", line)
+                for line in new_lines:
+                    yield from self._format_diff_line("+", line)
+                position = end
+            for line in lines[position:old_end]:
+                yield from self._format_diff_line(" ", line)
+
+    def _format_diff_range(self, start: int, end: int) -> str:
+        """Format the range of lines of a unified diff hunk header, like "difflib" does."""
+        length = end - start
+        if length == 1:
+            return f"{start + 1}"
+        if length == 0:
+            return f"{start},0"
+        return f"{start + 1},{length}"
+
+    def _format_diff_line(self, tag: str, line: str) -> Iterator[str]:
+        """Generate a line of a unified diff, marking the line that misses its final newline."""
+        yield f"{tag}{line}"
+        if not line.endswith("\n"):
+            yield "\n\\ No newline at end of file\n"
+
+    def _strip_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Remove newline characters and mimic "str.strip()" over the whole sequence of lines.
+
+        Leading blank lines are skipped and the first non-blank line is stripped on the left. Blank
+        lines are held back until a non-blank line follows, so that trailing ones are dropped.
+        """
+        blank_lines = []  # type: List[str]
+        started = False
+
+        for line in lines:
+            if line.endswith("\n"):
+                line = line[:-1]
+            if not line.strip():
+                if started:
+                    blank_lines.append(line)
+                continue
+            if started:
+                yield from blank_lines
+                blank_lines.clear()
+            else:
+                line = line.lstrip()
+                started = True
+            yield line
+
+    def _format_string(self, string: str) -> str:
+        """Format the string, in parallel if it is large and nothing needs to be recorded."""
+        if (
+            self._parallel_threshold is not None
+            and len(string) >= self._parallel_threshold
+            and self._stats is None
+            and not self._verify
+        ):
+            workers = self._parallel_workers or os.cpu_count() or 1
+            # Forking a multi-threaded process may deadlock, as locks held by other threads (such
+            # as those of the pool of "aprettify()") are copied in the locked state.
+            if workers > 1 and threading.active_count() == 1:
+                import multiprocessing
+
+                # Daemonic processes, such as those of "multiprocessing.Pool", can't have children.
+                if not multiprocessing.current_process().daemon:
+                    return self._prettify_parallel(string, workers)
+        return "".join(self._iter_prettify(string))
+
+    def _prettify_parallel(self, string: str, workers: int) -> str:
+        """Format the string by splitting it into chunks of sections formatted by other processes.
+
+        The chunks start at section headers that are not indented: these can't be continuation
+        lines, hence the parser is always in the same state when reaching them, and each chunk is
+        formatted independently of the preceding ones. There are a few chunks per worker to balance
+        the load. The outputs of the chunks are then concatenated, which gives the same output as
+        formatting the whole string at once.
+
+        Sections duplicated across chunks are detected by comparing the names of the sections of
+        each chunk. If any chunk is invalid, the string is formatted again serially so that the
+        same exception as "prettify()" is raised, with the same line numbers.
+        """
+        chunks = self._split_sections(string.strip(), len(string) // (workers * 4))
+        if len(chunks) == 1:
+            return "".join(self._iter_prettify(string))
+
+        # A bare copy, as there is no need to send the cache to the workers.
+        formatter = ConfigFormatter(engine=self._engine)
+        function = functools.partial(_format_chunk_or_error, formatter)
+        results = run_jobs(function, chunks, jobs=workers)
+
+        sections = set()
+        for result in results:
+            if isinstance(result, Exception) or not sections.isdisjoint(result[1]):
+                return "".join(self._iter_formatted(string))
+            sections.update(result[1])
+
+        return "".join(text for text, _ in results)
+
+    def _split_sections(self, string: str, size: int) -> List[Tuple[str, int]]:
+        """Split the stripped string at non-indented section headers, into chunks of about "size".
+
+        Each chunk is returned with the number of its first line in the string. Joining the chunks
+        with newline characters gives back the string.
+        """
+        chunks = []
+        start = 0
+        lineno = 1
+        while True:
+            header = None
+            if start + size < len(string):
+                header = self._find_header_after(string, start + size)
+            if header is None:
+                chunks.append((string[start:], lineno))
+                return chunks
+            end = header[0]
+            last = end - 1  # The newline character separating the chunks.
+            chunks.append((string[start:last], lineno))
+            lineno += string.count("\n", start, end)
+            start = end
+
+    def _format_chunk(self, string: str, first_lineno: int) -> str:
+        """Format a chunk of a stripped configuration as part of the whole, see "_split_sections()".
+
+        Unlike "prettify()", the chunk is not stripped: its trailing blank lines precede the next
+        chunk in the configuration. As "configupdater" drops the blank lines ending an empty section
+        at the end of the string, a dummy section header is appended to the chunk and removed from
+        the output.
+        """
+        if self._engine == "native":
+            return "".join(self._iter_native(string.split("\n"), first_lineno))
+        string = f"{string}\n{self._find_dummy_section(string)}"
+        document, has_dummy_top_section = self._load_config(string)
+        lines = list(self._format_config(document, has_dummy_top_section=has_dummy_top_section))
+        lines.pop()
+        return "".join(lines)
+
+    def _iter_prettify(self, string: str) -> Iterator[str]:
+        """Generate the fragments that, once concatenated, make up the formatted configuration."""
+        if self._stats is not None:
+            return iter(self._prettify_with_stats(string))
+        if self._verify:
+            return self._iter_verified(string.split("\n"))
+        return self._iter_formatted(string)
+
+    def _iter_formatted(self, string: str) -> Iterator[str]:
+        """Generate the formatted fragments, without recording statistics nor verifying them."""
         string = string.strip()
         if not string:
-            return "\n"
+            return iter(("\n",))
+        if self._engine == "native":
+            return self._iter_native(string.split("\n"))
         base_config, has_dummy_top_section = self._load_config(string)
         return self._format_config(base_config, has_dummy_top_section=has_dummy_top_section)
 
-    def _load_config(self, string: str) -> Tuple[configupdater.parser.Document, bool]:
-        """Load the given string as a configuration document.
+    def _iter_verified(self, lines: Iterable[str]) -> Iterator[str]:
+        """Generate the formatted fragments, checking their semantic equivalence with the input.
 
-        It also implements a workaround to handle configs that do not have a top section header.
+        The input lines are read by a "_SemanticReader" as the formatter consumes them, and the
+        output lines as they're generated. The sections and options found are compared as soon as
+        they're complete on both sides, so that there is no need to parse the input and the output
+        again with "configparser" afterwards.
         """
-        parser = configupdater.parser.Parser(
-            strict=True,
-            delimiters=("=", ":"),
-            comment_prefixes=("#", ";"),
-            inline_comment_prefixes=None,
-            allow_no_value=False,
-            empty_lines_in_values=True,
-        )
+        source, output = _SemanticReader(), _SemanticReader()
+        lines = source.read(lines)
+
+        if self._engine == "native":
+            fragments = self._iter_native_stream(lines)
+        else:
+            fragments = self._iter_formatted(self._join_lines(lines))
+
+        for fragment in fragments:
+            output.feed(fragment)
+            if output.events:
+                _compare_semantics(source, output)
+            yield fragment
+
+        source.close()
+        output.close()
+        _compare_semantics(source, output, complete=True)
+
+    def _prettify_with_stats(self, string: str) -> List[str]:
+        """Generate the formatted fragments as "_iter_prettify()" does, recording statistics.
+
+        The fragments are all generated before being returned, so that the time the caller spends
+        consuming them is not accounted.
+        """
+        timings = {}
+        blocks = collections.Counter()  # type: collections.Counter
+        fallback = False
+
+        start = time.perf_counter()
+        stripped = string.strip()
+        timings["strip"] = time.perf_counter() - start
+
+        if not stripped:
+            fragments = ["\n"]
+        elif self._engine == "native":
+            start = time.perf_counter()
+            native_blocks = list(self._iter_native_blocks(stripped.split("\n")))
+            timings["tokenize"] = time.perf_counter() - start
+            fragments = [text for _, _, _, text in native_blocks]
+            fallback = _count_native_blocks(native_blocks, blocks)
+        else:
+            start = time.perf_counter()
+            document, fallback = self._load_config(stripped)
+            timings["parse"] = time.perf_counter() - start
+            start = time.perf_counter()
+            fragments = list(self._format_config(document, has_dummy_top_section=fallback))
+            timings["format"] = time.perf_counter() - start
+            self._count_blocks(document, blocks)
+            if fallback:
+                blocks["section"] -= 1
+
+        if self._verify:
+            start = time.perf_counter()
+            source, output = _SemanticReader(), _SemanticReader()
+            source.feed_many(string.split("\n"))
+            source.close()
+            output.feed_many(fragments)
+            output.close()
+            _compare_semantics(source, output, complete=True)
+            timings["verify"] = time.perf_counter() - start
 
+        self._stats._record(len(string), timings, blocks, fallback)
+        return fragments
+
+    def _count_blocks(self, container: object, blocks: collections.Counter) -> None:
+        """Recursively count the blocks of a "configupdater" document by type."""
+        for block in container.iter_blocks():
+            if block.lines:  # Blocks whose lines were all merged into an option are not output.
+                blocks[type(block).__name__.lower()] += 1
+            if hasattr(block, "iter_blocks"):
+                self._count_blocks(block, blocks)
+
+    def prettify_incremental(
+        self, source: str, formatted: str, edit: TextEdit
+    ) -> Tuple[str, List[TextEdit]]:
+        """Format the source modified by the edit, reusing the formatted output of the source.
+
+        Only the sections affected by the edit are parsed and formatted again. The sections are
+        delimited by the headers that are not indented: these can't be continuation lines, hence
+        the parser is in a known state when reaching them. The "formatted" string must be the
+        output of "prettify()" for the source.
+
+        It returns the formatted output of the modified source, together with the list of edits
+        turning the previously formatted output into the new one. Edits are sorted, they don't
+        overlap and their offsets all refer to the previously formatted output.
+
+        The native tokenizer is used whatever the engine of the formatter.
+        """
+        start, end, text = edit
+        if not 0 <= start <= end <= len(source):
+            raise ValueError(
+                f"Invalid edit range ({start}, {end}) for a source of length {len(source)}"
+            )
+
+        before = self._find_header_before(source, start)
+        after = self._find_header_after(source, end)
+        region_start = 0 if before is None else before[0]
+        region_end = len(source) if after is None else after[0]
+
+        formatted_start, formatted_end = 0, len(formatted)
+        if before is not None:
+            formatted_start = self._find_formatted_header(formatted, before[1], 0)
+        if after is not None:
+            formatted_end = self._find_formatted_header(
+                formatted, after[1], max(formatted_start, 0)
+            )
+
+        if before is None and after is None or formatted_start < 0 or formatted_end < 0:
+            new_source = source[:start] + text + source[end:]
+            new_formatted = self.prettify(new_source)
+            return new_formatted, self._compute_edits(formatted, 0, len(formatted), new_formatted)
+
+        lines = (source[region_start:start] + text + source[end:region_end]).split("\n")
+        if after is not None:
+            lines.pop()  # The region ends with a newline followed by the next header.
+        else:
+            while lines and not lines[-1].strip():
+                lines.pop()
+        if before is None:
+            while lines and not lines[0].strip():
+                lines.pop(0)
+            if lines:
+                lines[0] = lines[0].lstrip()
+            first_lineno = 1
+        else:
+            # Line numbers are relative to the stripped source, as in "prettify()".
+            first_content = _NON_SPACE_REGEX.search(source)
+            first_lineno = source.count("\n", first_content.start(), region_start) + 1
+
+        # As in "prettify()", parsing errors are only raised once duplicates have been ruled out,
+        # while duplicates are raised in the order they appear, including the sections of the
+        # region duplicating a section preceding it.
+        fragments = []  # type: List[str]
+        region_error = None  # type: Optional[configparser.Error]
         try:
-            return parser.read_string(string), False
-        except configupdater.MissingSectionHeaderError:
-            i = 1
-            while True:
-                dummy_section = f"[config-formatter-dummy-section-name-{i}]"
-                if dummy_section in string:
-                    i += 1
+            fragments.extend(self._iter_native(lines, first_lineno))
+        except (ParsingError, DuplicateSectionError, DuplicateOptionError) as error:
+            region_error = error
+
+        region = "".join(fragments)
+        old_region = formatted[formatted_start:formatted_end]
+        complete = region_error is None or isinstance(region_error, ParsingError)
+        self._check_new_sections(
+            formatted, formatted_start, formatted_end, region, old_region, complete=complete
+        )
+        if region_error is not None:
+            raise region_error
+
+        new_formatted = formatted[:formatted_start] + region + formatted[formatted_end:]
+        edits = self._compute_edits(formatted, formatted_start, formatted_end, region)
+        return new_formatted, edits
+
+    def prettify_range(self, text: str, start_line: int, end_line: int) -> str:
+        """Format the lines from "start_line" to "end_line" (inclusive, starting at 1) of the text.
+
+        The range is first expanded to the boundaries of the blocks it overlaps: it starts at the
+        option or section header it belongs to, and ends right before the next one, so that the
+        continuation lines, comments and blank lines following an option are formatted with it.
+        These boundaries are the options and section headers that are not indented: these can't
+        be continuation lines, hence the parser is always in the same state when reaching them.
+        Only the expanded range is formatted, as "prettify()" would format these lines, and the
+        rest of the text is left untouched. The cost is therefore proportional to the size of the
+        expanded range, not to the size of the text.
+
+        Parsing errors are reported with the line numbers of the text. Duplicated sections and
+        options are only detected within the expanded range. The native tokenizer is used whatever
+        the engine of the formatter.
+        """
+        start = end = -1
+        if 1 <= start_line <= end_line:
+            start = _find_line_start(text, start_line)
+            end = _find_line_start(text, end_line)
+        if not 0 <= start <= end < len(text):
+            line_count = len(_split_lines(text))
+            raise ValueError(
+                f"Invalid line range ({start_line}, {end_line}) for a text of {line_count} lines"
+            )
+
+        first_lineno = start_line
+        while start > 0 and not self._is_range_boundary(text, start):
+            start = text.rfind("\n", 0, start - 1) + 1
+            first_lineno -= 1
+
+        end = text.find("\n", end) + 1
+        while 0 < end < len(text) and not self._is_range_boundary(text, end):
+            end = text.find("\n", end) + 1
+        if end == 0:
+            end = len(text)
+
+        lines = text[start:end].split("\n")
+        if end == len(text):
+            # As in "prettify()", the text is stripped: trailing blank lines are removed.
+            while lines and not lines[-1].strip():
+                lines.pop()
+        elif not lines[-1]:
+            lines.pop()  # The range ends with the newline character of its last line.
+        if start == 0:
+            skipped = 0
+            while skipped < len(lines) and not lines[skipped].strip():
+                skipped += 1
+            lines = lines[skipped:]
+            first_lineno += skipped
+            if lines:
+                lines[0] = lines[0].lstrip()
+
+        if lines:
+            formatted = "".join(self._iter_native(lines, first_lineno))
+        elif start == 0 and end == len(text):
+            formatted = "\n"
+        else:
+            formatted = ""
+        return text[:start] + formatted + text[end:]
+
+    def _is_range_boundary(self, text: str, offset: int) -> bool:
+        """Check whether the line starting at the offset is a non-indented option or header."""
+        line_end = text.find("\n", offset)
+        line = text[offset:] if line_end == -1 else text[offset:line_end]
+        if not line or line[0].isspace() or line.startswith(_COMMENT_PREFIXES):
+            return False
+        value = line.strip()
+        return bool(_SECTION_REGEX.match(value) or _OPTION_REGEX.match(value))
+
+    def _find_header_before(self, source: str, offset: int) -> Optional[Tuple[int, str]]:
+        """Find the last non-indented section header ending before the offset.
+
+        It returns the offset of the header line and the name of the section.
+        """
+        end = offset
+        while True:
+            position = source.rfind("\n[", 0, end) + 1
+            if position == 0 and not source.startswith("["):
+                return None
+            line_end = source.find("\n", position)
+            if line_end != -1 and line_end < offset:
+                match = _SECTION_REGEX.match(source[position:line_end].rstrip())
+                if match:
+                    return position, match.group("header")
+            if position == 0:
+                return None
+            end = position - 1
+
+    def _find_header_after(self, source: str, offset: int) -> Optional[Tuple[int, str]]:
+        """Find the first non-indented section header starting after the offset.
+
+        It returns the offset of the header line and the name of the section.
+        """
+        start = offset
+        while True:
+            position = source.find("\n[", start) + 1
+            if position == 0:
+                return None
+            line_end = source.find("\n", position)
+            if line_end == -1:
+                line_end = len(source)
+            match = _SECTION_REGEX.match(source[position:line_end].rstrip())
+            if match:
+                return position, match.group("header")
+            start = position
+
+    def _find_formatted_header(self, formatted: str, name: str, start: int) -> int:
+        """Find the offset of the header line of the section in the formatted output, or -1."""
+        needle = f"[{name}]"
+        position = start
+        while True:
+            position = formatted.find(needle, position)
+            if position == -1:
+                return -1
+            if position == 0 or formatted[position - 1] == "\n":
+                line_end = formatted.find("\n", position)
+                if line_end == -1:
+                    line_end = len(formatted)
+                match = _SECTION_REGEX.match(formatted[position:line_end])
+                if match and match.group("header") == name:
+                    return position
+            position += 1
+
+    def _check_new_sections(
+        self, formatted: str, start: int, end: int, region: str, old_region: str, *, complete: bool
+    ) -> None:
+        """Ensure the sections introduced in the region don't already exist outside of it.
+
+        If the region is not complete because its parsing stopped on a duplicate, the sections
+        following the region are not checked: "prettify()" would have stopped before them.
+        """
+        new_sections = set(self._iter_formatted_sections(region))
+        new_sections.difference_update(self._iter_formatted_sections(old_region))
+        if not new_sections:
+            return
+        texts = (formatted[:start], formatted[end:]) if complete else (formatted[:start],)
+        for text in texts:
+            for section in self._iter_formatted_sections(text):
+                if section in new_sections:
+                    raise DuplicateSectionError(section, "<string>")
+
+    def _iter_formatted_sections(self, formatted: str) -> Iterator[str]:
+        """Generate the names of the sections of an already formatted configuration."""
+        for match in _FORMATTED_SECTION_REGEX.finditer(formatted):
+            match = _SECTION_REGEX.match(match.group())
+            if match:
+                yield match.group("header")
+
+    def _compute_edits(self, old: str, start: int, end: int, new: str) -> List[TextEdit]:
+        """Compute the line-based edits replacing "old[start:end]" by "new"."""
+        old_lines = _split_lines(old[start:end])
+        new_lines = _split_lines(new)
+
+        prefix = 0
+        while prefix < min(len(old_lines), len(new_lines)):
+            if old_lines[prefix] != new_lines[prefix]:
+                break
+            start += len(old_lines[prefix])
+            prefix += 1
+        suffix = 0
+        while suffix < min(len(old_lines), len(new_lines)) - prefix:
+            if old_lines[-suffix - 1] != new_lines[-suffix - 1]:
+                break
+            suffix += 1
+        old_end, new_end = len(old_lines) - suffix, len(new_lines) - suffix
+        old_lines, new_lines = old_lines[prefix:old_end], new_lines[prefix:new_end]
+
+        offsets = list(itertools.accumulate([start] + [len(line) for line in old_lines]))
+        import difflib
+
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        return [
+            TextEdit(offsets[i1], offsets[i2], "".join(new_lines[j1:j2]))
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+            if tag != "equal"
+        ]
+
+    def _find_difference(self, string: str) -> Optional[int]:
+        """Compare the given string with its formatted version and locate the first difference."""
+        if self._stats is None and self._is_canonical(string):
+            return None
+
+        position = 0
+        lineno = 1
+
+        for fragment in self._iter_prettify(string):
+            end = position + len(fragment)
+            if not string.startswith(fragment, position):
+                common = os.path.commonprefix([fragment, string[position:end]])
+                return lineno + common.count("\n")
+            lineno += fragment.count("\n")
+            position = end
+
+        if position != len(string):
+            return lineno
+        return None
+
+    def _is_canonical(self, string: str) -> bool:
+        """Check whether the string is identical to its formatted version, without formatting it.
+
+        The lines are scanned once and validated against the output rules, following the parsing
+        rules of the native engine. Lines whose formatting would require tracking more state (such
+        as a comment followed by continuation lines of the preceding option, or characters
+        splitting values into several lines) are not taken as canonical. False negatives are thus
+        possible, but any string recognized as canonical is guaranteed to be formatted.
+        """
+        if string == "\n":
+            return True
+        if not string.endswith("\n") or _LINE_BREAK_REGEX.search(string):
+            return False
+
+        sections = set()
+        options = set()
+        indentation = None  # type: Optional[str]  # Set for continuation lines of an option.
+        after_comment = False  # Whether a comment follows the option, preventing continuations.
+        blank_lines = 0
+
+        lines = string.split("\n")
+        lines.pop()
+        if not lines[0]:
+            return False
+
+        for line in lines:
+            if not line:
+                blank_lines += 1
+                if indentation is None and blank_lines > 1:
+                    return False
+                continue
+
+            first_character = line[0]
+
+            if first_character == " ":
+                if indentation is None or after_comment or not line.startswith(indentation):
+                    return False
+                if line[-1].isspace() or line[len(indentation)].isspace():
+                    return False
+                blank_lines = 0
+                continue
+
+            # Blank lines not followed by continuation lines are merged into a single one.
+            if blank_lines > 1 or line[-1].isspace():
+                return False
+            blank_lines = 0
+
+            if first_character in "#;":
+                if indentation is not None:
+                    after_comment = True
+                continue
+
+            if first_character == "[":
+                match = _SECTION_REGEX.match(line)
+                if match:
+                    section, raw_comment = match.group("header", "raw_comment")
+                    if raw_comment and raw_comment != f"  {raw_comment.strip()}":
+                        return False
+                    if section in sections:
+                        return False
+                    sections.add(section)
+                    options.clear()
+                    indentation = None
                     continue
-                return parser.read_string(f"{dummy_section}\n{string}"), True
+
+            match = _CANONICAL_OPTION_REGEX.fullmatch(line)
+            if not match:
+                return False
+            option, value = match.group("option", "value")
+            if option in options:
+                return False
+            options.add(option)
+            indentation = _indentation(len(option) + 3 if value else 4)
+            after_comment = False
+
+        return not blank_lines
+
+    def _load_config(self, string: str) -> Tuple["configupdater.parser.Document", bool]:
+        """Load the given string as a configuration document.
+
+        It also implements a workaround to handle configs that do not have a top section header.
+        Such configs are detected beforehand and parsed under a dummy section, so that the string
+        is parsed only once.
+        """
+        import configupdater.parser
+
+        # The parser accumulates the sections it reads, so a new one is needed for each string.
+        parser = configupdater.parser.Parser(**_PARSER_OPTIONS)
+        lines = io.StringIO(string)
+
+        if self._has_top_section_header(string):
+            return parser.read_file(lines, "<string>"), False
+
+        dummy_section = self._find_dummy_section(string)
+        lines_with_header = itertools.chain((f"{dummy_section}\n",), lines)
+        return parser.read_file(lines_with_header, "<string>"), True
+
+    def _find_dummy_section(self, string: str) -> str:
+        """Find a dummy section header which does not appear anywhere in the given string.
+
+        All the candidate headers present in the string are collected in a single pass, then the
+        first one that is not used is selected.
+        """
+        used = set(_DUMMY_SECTION_REGEX.findall(string))
+        i = 1
+        while str(i) in used:
+            i += 1
+        return f"[config-formatter-dummy-section-name-{i}]"
+
+    def _has_top_section_header(self, string: str) -> bool:
+        """Check whether the first line that is neither empty nor a comment is a section header.
+
+        Otherwise, "configupdater" would raise a "MissingSectionHeaderError" when parsing it.
+        """
+        start = 0
+        while start < len(string):
+            end = string.find("\n", start)
+            if end == -1:
+                end = len(string)
+            line = string[start:end]
+            start = end + 1
+            if line.startswith(_COMMENT_PREFIXES):
+                continue
+            value = line.strip()
+            if value:
+                return _SECTION_REGEX.match(value) is not None
+        return True
 
     def _format_config(
-        self, source: configupdater.container.Container, *, has_dummy_top_section: bool
-    ) -> str:
-        """Recursively construct a normalized string of the given configuration."""
-        output = ""
+        self, source: "configupdater.container.Container", *, has_dummy_top_section: bool
+    ) -> Iterator[str]:
+        """Recursively generate the normalized lines of the given configuration."""
+        import configupdater
 
         for block in source.iter_blocks():
             if isinstance(block, configupdater.Section):
                 if has_dummy_top_section:
                     has_dummy_top_section = False
                 else:
-                    comment = block.raw_comment.strip()
-                    if comment:
-                        output += f"[{block.name}]  {comment}\n"
-                    else:
-                        output += f"[{block.name}]\n"
-                output += self._format_config(block, has_dummy_top_section=False)
+                    yield self._format_section(block.name, block.raw_comment)
+                yield from self._format_config(block, has_dummy_top_section=False)
             elif isinstance(block, configupdater.Comment):
                 for line in block.lines:
                     comment = line.strip()
-                    output += f"{comment}\n"
+                    yield f"{comment}\n"
             elif isinstance(block, configupdater.Space):
                 if block.lines:
-                    output += "\n"
+                    yield "\n"
             elif isinstance(block, configupdater.Option):
-                key = block.raw_key
-                value = block.value
-                if value is None:  # Should never happen in theory as "allow_no_value" is disabled.
-                    output += f"{key}\n"
-                elif "\n" in value:
-                    first, *lines = (line.strip() for line in value.splitlines())
-                    if not first:
-                        output += f"{key} =\n"
-                        indent = 4
-                    else:
-                        output += f"{key} = {first}\n"
-                        indent = len(key) + 3
-                    for line in lines:
-                        if line:
-                            output += f"{' ' * indent}{line}\n"
-                        else:
-                            output += "\n"
-                else:
-                    value = value.strip()
-                    if value:
-                        output += f"{key} = {value}\n"
-                    else:
-                        output += f"{key} =\n"
+                yield from self._format_option(block.raw_key, block.value)
             else:
                 raise ValueError("Encountered an unexpected block type: '%s'", type(block).__name__)
 
-        return output
+    def _format_section(self, name: str, raw_comment: str) -> str:
+        """Construct the normalized header line of a section."""
+        comment = raw_comment.strip()
+        if comment:
+            return f"[{name}]  {comment}\n"
+        return f"[{name}]\n"
+
+    def _format_option(self, key: str, value: Optional[str]) -> List[str]:
+        """Construct the normalized lines of an option, including its continuation lines."""
+        if value is None:  # Should never happen in theory as "allow_no_value" is disabled.
+            return [f"{key}\n"]
+        if "\n" in value:
+            return self._format_continuation(key, list(map(str.strip, value.splitlines())))
+        value = value.strip()
+        if value:
+            return [f"{key} = {value}\n"]
+        return [f"{key} =\n"]
+
+    def _format_continuation(self, key: str, lines: List[str]) -> List[str]:
+        """Construct the normalized lines of an option whose value spans several stripped lines.
+
+        Continuation lines are aligned with the first line of the value, or indented by four
+        spaces if it is empty. The indentation is built once per width, and each output line is
+        built at once from it, making this suitable for values of thousands of lines.
+        """
+        first = lines[0]
+        if first:
+            head = f"{key} = {first}\n"
+            indentation = _indentation(len(key) + 3)
+        else:
+            head = f"{key} =\n"
+            indentation = _indentation(4)
+        formatted = [f"{indentation}{line}\n" if line else "\n" for line in lines]
+        formatted[0] = head
+        return formatted
+
+    def _iter_native(self, lines: Iterable[str], first_lineno: int = 1) -> Iterator[str]:
+        """Tokenize the given lines and generate the normalized output, line after line.
+
+        See "_iter_native_blocks()" for details.
+        """
+        return map(_BLOCK_TEXT, self._iter_native_blocks(lines, first_lineno))
+
+    def _iter_native_blocks(
+        self, lines: Iterable[str], first_lineno: int = 1
+    ) -> Iterator[Tuple[int, int, int, str]]:
+        """Tokenize the given lines and generate the normalized output, block after block.
+
+        The lines must not contain their trailing newline character. This engine replicates the
+        parsing rules of "configupdater" (which are derived from "configparser") without
+        materializing any document. Only the option being currently parsed is kept in memory,
+        together with the comments and spaces that follow it, because a continuation line may
+        still be appended to it. Options and sections preceding the first section header are
+        attributed to an implicit top section whose header is not output. Its name is empty so
+        that it cannot clash with any actual section. The "first_lineno" is used to report errors.
+
+        Each output line is generated together with the kind of the block it belongs to and the
+        numbers of the first and last source lines of this block. Blocks span contiguous lines, and
+        the lines of a block are all generated with the same numbers. Comment lines are generated
+        as separate blocks.
+        """
+        source = "<string>"
+        error = None  # type: Optional[ParsingError]
+        sections = set()
+        options = set()  # Those of the current section, which can't be continued once left.
+        section = ""
+        key = None  # type: Optional[str]
+        values = []  # type: List[str]
+        key_first = key_last = 0
+        tail = []  # type: List[Tuple[int, int, List[str]]]
+        space_first = None  # type: Optional[int]
+        indent_level = 0
+        lineno = first_lineno - 1
+
+        for lineno, line in enumerate(lines, start=first_lineno):
+            if line.startswith(_COMMENT_PREFIXES):
+                kind = _COMMENT
+            elif not line or line.isspace():
+                kind = _SPACE
+            else:
+                value = line.strip()
+                # No earlier character can be the first non-blank one: this gives the indent.
+                indent = line.find(value[0])
+
+                if key and indent > indent_level:
+                    if tail and tail[-1][0] == _COMMENT:
+                        comment_lines = tail.pop()[2]
+                        if tail:
+                            tail[-1][2].extend(comment_lines)
+                        else:
+                            values.extend(comment_line.strip() for comment_line in comment_lines)
+                    if tail:
+                        tail[-1][2].append(line)
+                    else:
+                        values.append(value)
+                        key_last = lineno
+                    continue
+
+                indent_level = indent
+
+                match = _SECTION_REGEX.match(value)
+                if match:
+                    if key is not None:
+                        yield from self._flush_native(key, values, key_first, key_last, tail)
+                        key, values, tail = None, [], []
+                    elif space_first is not None:
+                        yield _SPACE, space_first, lineno - 1, "\n"
+                    space_first = None
+                    section = match.group("header")
+                    if section in sections:
+                        raise DuplicateSectionError(section, source, lineno)
+                    sections.add(section)
+                    options.clear()
+                    header = self._format_section(section, match.group("raw_comment"))
+                    yield _SECTION, lineno, lineno, header
+                    continue
+
+                match = _OPTION_REGEX.match(value)
+                if match:
+                    name, optval = match.group("option", "value")
+                    if not name:
+                        error = self._add_native_error(error, source, lineno, line)
+                    name = name.rstrip()
+                    if name in options:
+                        raise DuplicateOptionError(section, name, source, lineno)
+                    options.add(name)
+                    if key is not None:
+                        yield from self._flush_native(key, values, key_first, key_last, tail)
+                    elif space_first is not None:
+                        yield _SPACE, space_first, lineno - 1, "\n"
+                    space_first = None
+                    key, values, tail = name, [optval.strip()], []
+                    key_first = key_last = lineno
+                    continue
+
+                if value.startswith(_COMMENT_PREFIXES):
+                    kind = _COMMENT
+                else:
+                    error = self._add_native_error(error, source, lineno, line)
+                    continue
+
+            if key:
+                # The block may still be merged into the option by a subsequent continuation line.
+                if tail and tail[-1][0] == kind:
+                    tail[-1][2].append(line)
+                else:
+                    tail.append((kind, lineno, [line]))
+            elif kind == _COMMENT:
+                if space_first is not None:
+                    yield _SPACE, space_first, lineno - 1, "\n"
+                    space_first = None
+                yield _COMMENT, lineno, lineno, f"{line.strip()}\n"
+            elif space_first is None:
+                space_first = lineno
+
+        if key is not None:
+            yield from self._flush_native(key, values, key_first, key_last, tail)
+        elif space_first is not None:
+            yield _SPACE, space_first, lineno, "\n"
+
+        if error is not None:
+            raise error
+
+    def _flush_native(
+        self,
+        key: str,
+        values: List[str],
+        first: int,
+        last: int,
+        tail: List[Tuple[int, int, List[str]]],
+    ) -> Iterator[Tuple[int, int, int, str]]:
+        """Generate the normalized output of a fully parsed option and the blocks following it."""
+        if tail and tail[0][0] == _SPACE:
+            _, space_first, space = tail[0]
+            non_empty = [i for i, line in enumerate(space) if line.strip()]
+            if non_empty:
+                merged = non_empty[-1] + 1
+                values.append("\n".join(line.lstrip(" ") for line in space[:merged]))
+                last = space_first + merged - 1
+                tail[0] = (_SPACE, space_first + merged, space[merged:])
+
+        lines = self._format_option(key, "\n".join(values).rstrip())
+        yield from zip(
+            itertools.repeat(_OPTION), itertools.repeat(first), itertools.repeat(last), lines
+        )
+
+        for kind, first, lines in tail:
+            if kind == _COMMENT:
+                for lineno, line in enumerate(lines, start=first):
+                    yield _COMMENT, lineno, lineno, f"{line.strip()}\n"
+            elif lines:
+                yield _SPACE, first, first + len(lines) - 1, "\n"
+
+    def _add_native_error(
+        self, error: Optional[ParsingError], source: str, lineno: int, line: str
+    ) -> ParsingError:
+        """Record a non-fatal parsing error, to be raised once all lines have been read."""
+        if error is None:
+            error = ParsingError(source)
+        error.append(lineno, repr(line))
+        return error
+
+
+class _SemanticReader:
+    """Read the sections and options of a configuration the way "configparser" does.
+
+    Lines are fed one by one, with or without their trailing newline character. Each complete
+    section header and option is appended to "events", as a "(_SECTION, name)" or "(_OPTION, name,
+    value)" tuple, with the value as "configparser" returns it. Lines "configparser" would reject
+    are reported as "(None, line)".
+    """
+
+    def __init__(self) -> None:
+        self.events = collections.deque()  # type: collections.deque
+        self._option = None  # type: Optional[str]
+        self._values = []  # type: List[str]
+        self._indent_level = 0
+
+    def feed(self, line: str) -> None:
+        """Read the next line of the configuration."""
+        value = line.strip()
+        if not value:
+            if self._option is not None:
+                self._values.append("")
+            return
+        if value[0] in "#;":
+            return
+        # The first non-blank character can't appear earlier in the line: this gives the indent.
+        indent_level = line.find(value[0])
+        if self._option is not None and indent_level > self._indent_level:
+            self._values.append(value)
+            return
+        self._indent_level = indent_level
+        self.close()
+        if value[0] == "[":
+            match = _SECTION_REGEX.match(value)
+            if match:
+                self.events.append((_SECTION, match.group("header")))
+                return
+        match = _OPTION_REGEX.match(value)
+        if match:
+            self._option = match.group("option").rstrip().lower()
+            self._values = [match.group("value").strip()]
+            return
+        self.events.append((None, value))
+
+    def feed_many(self, lines: Iterable[str]) -> None:
+        """Read the next lines of the configuration."""
+        for line in lines:
+            self.feed(line)
+
+    def read(self, lines: Iterable[str]) -> Iterator[str]:
+        """Generate the lines, reading each of them before it is consumed."""
+        for line in lines:
+            self.feed(line)
+            yield line
+
+    def close(self) -> None:
+        """Complete the option being read, if any."""
+        if self._option is not None:
+            self.events.append((_OPTION, self._option, "\n".join(self._values).rstrip()))
+            self._option = None
+
+
+def _compare_semantics(
+    source: _SemanticReader, output: _SemanticReader, *, complete: bool = False
+) -> None:
+    """Compare the events read so far from the source and from the output, discarding them.
+
+    If "complete" is set, both configurations have been entirely read and must have the same number
+    of events, otherwise the remaining events are kept until the other side catches up.
+    """
+    while source.events and output.events:
+        expected, actual = source.events.popleft(), output.events.popleft()
+        if expected != actual:
+            break
+    else:
+        if not complete or not (source.events or output.events):
+            return
+        expected = source.events[0] if source.events else None
+        actual = output.events[0] if output.events else None
+    raise VerificationError(
+        f"The output is not semantically identical to the input: expected "
+        f"{_describe_event(expected)}, got {_describe_event(actual)}"
+    )
+
+
+def _count_native_blocks(
+    native_blocks: Iterable[Tuple[int, int, int, str]], blocks: collections.Counter
+) -> bool:
+    """Count the blocks generated by the native tokenizer by type, for "FormattingStats".
+
+    It returns whether an option precedes the first section, as these are accounted as fallbacks.
+    """
+    fallback = False
+    previous_kind, previous_first = None, None
+    for kind, first, _, _ in native_blocks:
+        if kind != previous_kind or (kind != _COMMENT and first != previous_first):
+            blocks[_BLOCK_NAMES[kind]] += 1
+        if kind == _OPTION and not blocks["section"]:
+            fallback = True
+        previous_kind, previous_first = kind, first
+    return fallback
+
+
+def _describe_event(event: Optional[tuple]) -> str:
+    """Describe an event of a "_SemanticReader" for error messages."""
+    if event is None:
+        return "nothing"
+    if event[0] == _SECTION:
+        return f"section [{event[1]}]"
+    if event[0] == _OPTION:
+        return f"option '{event[1]}' with value {event[2]!r}"
+    return f"invalid line {event[1]!r}"
+
+
+class _ChangeTracker:
+    """Check whether the lines of a text and those formatted from them are identical.
+
+    The lines are compared as they're consumed, only those not yet matched by a formatted line are
+    held in memory.
+    """
+
+    def __init__(self) -> None:
+        self.changed = False
+        self._pending = collections.deque()  # type: collections.deque
+
+    def read(self, lines: Iterable[str]) -> Iterator[str]:
+        """Generate the original lines, recording them as they're consumed."""
+        for line in lines:
+            if not self.changed:
+                self._pending.append(line)
+            yield line
+
+    def compare(self, lines: Iterable[str]) -> Iterator[str]:
+        """Generate the formatted lines, comparing them to the recorded original ones."""
+        for line in lines:
+            if not self.changed and (not self._pending or self._pending.popleft() != line):
+                self.changed = True
+                self._pending.clear()
+            yield line
+
+    def close(self) -> bool:
+        """Account for the original lines left unmatched, and return whether the text changed."""
+        if self._pending:
+            self.changed = True
+            self._pending.clear()
+        return self.changed
+
+
+class FormattingStats:
+    """Statistics about the configurations formatted by a "ConfigFormatter", aggregated over calls.
+
+    The attributes are:
+        - "configurations": the number of formatted configurations ;
+        - "characters": the total number of characters of these configurations ;
+        - "fallbacks": the number of configurations parsed under a dummy section by the
+          "configupdater" engine, or having options outside of any section with the "native" one ;
+        - "blocks": the number of blocks of each type ("section", "option", "comment", "space") ;
+        - "timings": the time spent in each phase, in seconds. The "strip" phase removes the
+          surrounding blank characters. The "configupdater" engine then spends time in the "parse"
+          and "format" phases, while the "native" engine does both at once in the "tokenize" phase.
+          The output is then checked in the "verify" phase, if the formatter's "verify" is set.
+
+    Only configurations formatted successfully by "prettify()", "prettify_to()", "check()",
+    "prettify_edits()", "prettify_diff()" and the methods relying on them (such as
+    "prettify_many()" and "aprettify()") are accounted. Those read by "parse()", the streaming
+    methods ("iter_prettify()", "prettify_stream()" and "prettify_file()") and the partial ones
+    ("prettify_range()" and "prettify_incremental()") are not. The whole output has to be generated
+    to measure it, so "check()" doesn't stop at the first difference while statistics are
+    recorded. The same statistics can be shared by several formatters and threads.
+    """
+
+    def __init__(self) -> None:
+        self.configurations = 0
+        self.characters = 0
+        self.fallbacks = 0
+        self.blocks = collections.Counter({name: 0 for name in _BLOCK_NAMES.values()})
+        self.timings = collections.Counter()  # type: collections.Counter
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def merge(self, other: "FormattingStats") -> None:
+        """Add the statistics recorded by another instance to these ones."""
+        with other._lock:
+            configurations, characters, fallbacks = (
+                other.configurations,
+                other.characters,
+                other.fallbacks,
+            )
+            blocks, timings = other.blocks.copy(), other.timings.copy()
+        with self._lock:
+            self.configurations += configurations
+            self.characters += characters
+            self.fallbacks += fallbacks
+            self.blocks.update(blocks)
+            self.timings.update(timings)
+
+    def as_dict(self) -> dict:
+        """Export the statistics as a dictionary, which can be serialized to JSON."""
+        with self._lock:
+            return {
+                "configurations": self.configurations,
+                "characters": self.characters,
+                "fallbacks": self.fallbacks,
+                "blocks": dict(self.blocks),
+                "timings": dict(self.timings),
+            }
+
+    def _record(
+        self, characters: int, timings: dict, blocks: collections.Counter, fallback: bool
+    ) -> None:
+        """Account for a newly formatted configuration."""
+        with self._lock:
+            self.configurations += 1
+            self.characters += characters
+            self.fallbacks += fallback
+            self.blocks.update(blocks)
+            self.timings.update(timings)
+
+
+class FormattingCache:
+    """A persistent record of the configurations known to be already formatted.
+
+    Entries are opaque digests computed by "ConfigFormatter.cache_key()", accounting for the
+    configuration content, the version of the formatter and its options. When there are more than
+    "max_size" entries, the least recently used ones are evicted. Changes are written to disk by
+    "save()".
+
+    By default, the cache is stored in the "config-formatter" folder of the user cache directory,
+    which can be overridden by the "CONFIG_FORMATTER_CACHE_DIR" environment variable.
+
+    The cache can be shared between threads, and thus by formatters used asynchronously.
+    """
+
+    def __init__(self, path: Optional[str] = None, *, max_size: int = DEFAULT_CACHE_SIZE) -> None:
+        if max_size < 1:
+            raise ValueError(f"Invalid cache size '{max_size}', expected a positive integer")
+        self._path = path or os.path.join(self._default_directory(), "formatted.txt")
+        self._max_size = max_size
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict[str, None]
+        self._modified = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def path(self) -> str:
+        """The path of the file where the cache is stored."""
+        return self._path
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, digest: object) -> bool:
+        with self._lock:
+            if digest not in self._entries:
+                return False
+            self._entries.move_to_end(digest)
+            self._modified = True
+            return True
+
+    def add(self, digest: str) -> None:
+        """Record a configuration as being already formatted."""
+        with self._lock:
+            self._entries[digest] = None
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+            self._modified = True
+
+    def clear(self) -> None:
+        """Remove all the entries of the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._modified = True
+
+    def save(self) -> None:
+        """Write the cache to disk, if it changed since it was loaded or last saved."""
+        with self._lock:
+            if not self._modified:
+                return
+            content = "".join(f"{digest}\n" for digest in self._entries)
+            self._modified = False
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+            write_atomically(self._path, content)
+        except BaseException:
+            with self._lock:
+                self._modified = True
+            raise
+
+    def _load(self) -> None:
+        """Read the entries from disk, ignoring a missing or unreadable cache."""
+        try:
+            with open(self._path, "r", encoding="ascii") as file:
+                digests = [line.strip() for line in file]
+        except (OSError, UnicodeDecodeError):
+            return
+        for digest in digests:
+            if digest:
+                self._entries[digest] = None
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _default_directory() -> str:
+        """Find the directory in which the cache is stored by default."""
+        directory = os.environ.get("CONFIG_FORMATTER_CACHE_DIR")
+        if directory:
+            return directory
+        if sys.platform == "win32":
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+                os.path.expanduser("~"), ".cache"
+            )
+        return os.path.join(base, "config-formatter")
+
+
+def _find_line_start(text: str, lineno: int) -> int:
+    """Find the offset of the start of the line (starting at 1), or -1 if there are fewer lines.
+
+    Newlines are counted by blocks of characters first, so that the preceding lines need not be
+    iterated one by one.
+    """
+    position = 0
+    remaining = lineno - 1
+    while True:
+        end = position + _LINE_COUNT_BLOCK_SIZE
+        if end >= len(text):
+            break
+        count = text.count("\n", position, end)
+        if count >= remaining:
+            break
+        remaining -= count
+        position = end
+    for _ in range(remaining):
+        position = text.find("\n", position) + 1
+        if position == 0:
+            return -1
+    return position
+
+
+def _split_lines(text: str) -> List[str]:
+    """Split the text on newline characters only, keeping them at the end of each line."""
+    lines = [f"{line}\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _prettify_or_error(formatter: ConfigFormatter, string: str) -> Union[str, Exception]:
+    """Format the string, returning the exception raised if the configuration is invalid.
+
+    Invalid configurations are usually reported by a "configparser.Error", but "configupdater" may
+    also fail on some of them with other exceptions, which must not abort a whole batch either.
+    """
+    try:
+        return formatter.prettify(string)
+    except Exception as error:
+        return error
+
+
+def _prettify_recording_stats(
+    formatter: ConfigFormatter, string: str
+) -> Tuple[Union[str, Exception], "FormattingStats"]:
+    """Format the string as "_prettify_or_error()" does, returning the statistics recorded.
+
+    The statistics can't be recorded into those of the formatter, as it is run in another process.
+    """
+    stats = FormattingStats()
+    formatter = ConfigFormatter(engine=formatter.engine, verify=formatter.verify, stats=stats)
+    return _prettify_or_error(formatter, string), stats
+
+
+def _format_chunk_or_error(
+    formatter: ConfigFormatter, chunk: Tuple[str, int]
+) -> Union[Tuple[str, List[str]], Exception]:
+    """Format the chunk and list its sections, returning the exception raised if it is invalid.
+
+    Any exception is returned, as the whole configuration is then formatted again serially to
+    raise the appropriate one.
+    """
+    try:
+        formatted = formatter._format_chunk(*chunk)
+    except Exception as error:
+        return error
+    return formatted, list(formatter._iter_formatted_sections(formatted))
+
+
+class _DiscardFile(Exception):
+    """Raised within "_open_atomically()" to leave the target file untouched."""
+
+
+@contextlib.contextmanager
+def _open_atomically(path: str, *, encoding: str = "utf-8") -> Iterator[TextIO]:
+    """Open a temporary file next to the target, renamed over the target once written.
+
+    Readers of the file therefore never observe a partially written configuration. If an exception
+    is raised while writing, the temporary file is removed and the target is left untouched.
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    import tempfile
+
+    descriptor, temporary_path = tempfile.mkstemp(prefix=f".{filename}.", dir=directory)
+    try:
+        with open(
+            descriptor, "w", encoding=encoding, newline="\n", buffering=FILE_BUFFER_SIZE
+        ) as file:
+            yield file
+        if os.path.exists(path):
+            os.chmod(temporary_path, os.stat(path).st_mode & 0o7777)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+# The helpers below are shared with the "config_formatter_cli" module. They are not part of the
+# public API of the library (see "__all__"), but their signature must be kept stable for it.
+
+
+def detect_encoding(start: bytes) -> Tuple[bytes, str]:
+    """Detect the byte order mark the content starting with the given bytes begins with, if any.
+
+    Return the mark and the name of the codec to decode the rest of the content.
+    """
+    for mark, encoding in _BYTE_ORDER_MARKS:
+        if start.startswith(mark):
+            return mark, encoding
+    return b"", "utf-8"
+
+
+def run_jobs(function: Callable, items: Sequence, *, jobs: int) -> List:
+    """Apply the function to each item, using a pool of processes if more than one job is allowed.
+
+    Results are returned in the same order as the items.
+    """
+    if jobs <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    jobs = min(jobs, len(items))
+    chunksize = max(1, len(items) // (jobs * 4))
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(function, items, chunksize=chunksize))
+
+
+def write_atomically(path: str, content: str, *, encoding: str = "utf-8") -> None:
+    """Write the content to the file atomically, see "_open_atomically()"."""
+    with _open_atomically(path, encoding=encoding) as file:
+        file.write(content)
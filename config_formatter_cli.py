@@ -0,0 +1,838 @@
+"""The command-line interface of the `config-formatter` module, kept apart from the library.
+
+It formats files in place, checks them, formats those changed or staged in git, and runs as a
+daemon watching directories or answering requests on a socket.
+"""
+import argparse
+import fnmatch
+import functools
+import io
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from config_formatter import (
+    DEFAULT_PARALLEL_THRESHOLD,
+    ENGINES,
+    ConfigFormatter,
+    FormattingCache,
+    FormattingStats,
+    __version__,
+    detect_encoding,
+    run_jobs,
+    write_atomically,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    import socket
+
+CONFIG_FILE_PATTERNS = ("*.ini", "*.cfg")
+
+
+class _FileResult(NamedTuple):
+    path: str
+    status: str
+    message: Optional[str] = None
+    digest: Optional[str] = None
+    diff: Optional[str] = None
+    stats: Optional[FormattingStats] = None
+    formatted: Optional[str] = None
+
+
+class _GitError(Exception):
+    """Raised when a "git" command fails, with its error output as message."""
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the "config-formatter" command-line interface and return its exit code."""
+    parser = argparse.ArgumentParser(
+        prog="config-formatter",
+        description="Format .ini and .cfg configuration files in place.",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Do not write the files back, only report those that would be reformatted and exit "
+        "with status 1 if there is any.",
+    )
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="Do not write the files back, print the unified diff of the changes to the standard "
+        "output instead.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        metavar="PATH",
+        help="File or directory to format. Directories are searched recursively for files "
+        f"matching {', '.join(CONFIG_FILE_PATTERNS)} (hidden directories are skipped).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of files formatted in parallel (default: number of CPUs).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="native",
+        help="Engine used to parse and format the files (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not skip the files recorded as already formatted by previous runs.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print statistics about the formatted files (time spent in each phase, number of "
+        "blocks, etc.) to the standard error, in JSON format.",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check that the formatted files are semantically identical to the original ones, and "
+        "report them as errors otherwise.",
+    )
+    revisions = parser.add_mutually_exclusive_group()
+    revisions.add_argument(
+        "--changed-since",
+        metavar="REF",
+        default=None,
+        help="Only format the files changed since the given git revision, including uncommitted "
+        "and untracked ones (the paths default to the current directory).",
+    )
+    revisions.add_argument(
+        "--staged",
+        action="store_true",
+        help="Only format the files staged in the git index, as they are staged: the formatted "
+        "content is written to the index and to the working tree (the paths default to the "
+        "current directory).",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running once the files are formatted, and format them again whenever they "
+        "change (until interrupted).",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="SOCKET",
+        default=None,
+        help="Keep running and serve formatting requests on the given Unix socket (until "
+        "interrupted). Each request and response is a JSON object on a single line.",
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    args = parser.parse_args(argv)
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("argument -j/--jobs: must be a positive integer")
+    if args.staged and args.watch:
+        parser.error("argument --watch: not allowed with argument --staged")
+    if not args.paths and (args.changed_since is not None or args.staged):
+        args.paths = [os.curdir]
+    if not args.paths and args.socket is None:
+        parser.error("the following arguments are required: PATH")
+
+    staged = {}  # type: Dict[str, Tuple[str, str, str]]
+    try:
+        if args.changed_since is not None:
+            paths = _find_config_files(args.paths, changed=_find_changed_files(args.changed_since))
+        elif args.staged:
+            staged = _find_staged_files()
+            paths = _find_config_files(args.paths, changed=list(staged))
+        else:
+            paths = _find_config_files(args.paths)
+    except FileNotFoundError as error:
+        parser.error(f"no such file or directory: '{error.filename}'")
+    except _GitError as error:
+        parser.error(f"git: {error}")
+
+    jobs = args.jobs or os.cpu_count() or 1
+    formatter = ConfigFormatter(
+        engine=args.engine,
+        verify=args.verify,
+        parallel_threshold=DEFAULT_PARALLEL_THRESHOLD,
+        parallel_workers=jobs,
+    )
+    # Staged files are read from the index, the cache only knows about the working tree.
+    cache = None if args.no_cache or args.staged else FormattingCache()
+
+    cached = []  # type: List[_FileResult]
+    if cache is not None:
+        paths, cached = _skip_cached_files(formatter, cache, paths)
+
+    # A single file is formatted in the current process, possibly split among processes itself.
+    batch_formatter = formatter
+    if jobs > 1 and len(paths) > 1:
+        batch_formatter = ConfigFormatter(engine=args.engine, verify=args.verify)
+    function = functools.partial(
+        _format_file, batch_formatter, check=args.check, diff=args.diff, stats=args.stats
+    )
+    if args.staged:
+        try:
+            entries = [staged[_real_path(path)] for path in paths]
+            blobs = _read_blobs([blob for _, blob, _ in entries])
+        except _GitError as error:
+            print(f"error: git: {error}", file=sys.stderr)
+            return 1
+        function = functools.partial(_format_blob, function)
+        results = run_jobs(function, list(zip(paths, blobs)), jobs=jobs)
+        # The index is updated by the current process only, as git locks it while writing.
+        results = [
+            result if result.formatted is None else _stage_file(result, entry, blob)
+            for result, entry, blob in zip(results, entries, blobs)
+        ]
+    else:
+        results = run_jobs(function, paths, jobs=jobs)
+
+    if cache is not None:
+        for result in results:
+            if result.status == "unchanged" and result.digest is not None:
+                cache.add(result.digest)
+        try:
+            cache.save()
+        except OSError as error:
+            print(f"warning: cannot save cache to {cache.path}: {error}", file=sys.stderr)
+
+    results = cached + results
+
+    counts = {"reformatted": 0, "unchanged": 0, "error": 0}
+    for result in results:
+        counts[result.status] += 1
+        _report_result(result, diff=args.diff)
+
+    if args.check or args.diff:
+        summary = (
+            f"{counts['reformatted']} file(s) would be reformatted, "
+            f"{counts['unchanged']} file(s) would be left unchanged"
+        )
+    else:
+        summary = (
+            f"{counts['reformatted']} file(s) reformatted, "
+            f"{counts['unchanged']} file(s) left unchanged"
+        )
+    if counts["error"]:
+        summary += f", {counts['error']} file(s) failed to reformat"
+    print(f"{summary}.", file=sys.stderr)
+
+    if args.stats:
+        stats = FormattingStats()
+        for result in results:
+            if result.stats is not None:
+                stats.merge(result.stats)
+        print(json.dumps(stats.as_dict(), indent=2), file=sys.stderr)
+
+    if args.watch or args.socket is not None:
+        try:
+            _run_daemon(
+                formatter,
+                args.paths if args.watch else [],
+                socket_path=args.socket,
+                check=args.check,
+                diff=args.diff,
+            )
+        except KeyboardInterrupt:
+            pass
+        except OSError as error:
+            print(f"error: cannot listen on {args.socket}: {error}", file=sys.stderr)
+            return 1
+        return 0
+
+    if counts["error"] or (args.check and counts["reformatted"]):
+        return 1
+    return 0
+
+
+def _report_result(result: _FileResult, *, diff: bool) -> None:
+    """Print the outcome of formatting a file, if anything changed or went wrong."""
+    if result.diff is not None:
+        sys.stdout.write(result.diff)
+    if result.status == "reformatted" and result.message is not None:
+        print(f"would reformat {result.path} (line {result.message})", file=sys.stderr)
+    elif result.status == "reformatted" and diff:
+        print(f"would reformat {result.path}", file=sys.stderr)
+    elif result.status == "reformatted":
+        print(f"reformatted {result.path}", file=sys.stderr)
+    elif result.status == "error":
+        print(f"error: cannot format {result.path}: {result.message}", file=sys.stderr)
+
+
+def _find_config_files(paths: Iterable[str], *, changed: Optional[List[str]] = None) -> List[str]:
+    """List the files to format, searching the given directories recursively.
+
+    Files given explicitly are always included, whatever their name. Each file is listed once.
+
+    If the "changed" files are given (as real paths), only those are selected, and the directories
+    are not searched: the changed files they contain are filtered using the same rules instead.
+    """
+    found = []  # type: List[str]
+    seen = set()
+    changed_keys = set() if changed is None else set(map(os.path.normcase, changed))
+
+    for path in paths:
+        if os.path.isdir(path) and changed is not None:
+            candidates = _select_changed_files(path, changed)
+        elif os.path.isdir(path):
+            candidates = []
+            for root, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(name for name in dirnames if not name.startswith("."))
+                candidates.extend(
+                    os.path.join(root, name)
+                    for name in sorted(filenames)
+                    if any(fnmatch.fnmatch(name, pattern) for pattern in CONFIG_FILE_PATTERNS)
+                )
+        elif os.path.exists(path):
+            candidates = [path]
+            if changed is not None and _real_path(path) not in changed_keys:
+                candidates = []
+        else:
+            raise FileNotFoundError(2, "No such file or directory", path)
+
+        for candidate in candidates:
+            key = os.path.normcase(os.path.abspath(candidate))
+            if key not in seen:
+                seen.add(key)
+                found.append(candidate)
+
+    return found
+
+
+def _select_changed_files(directory: str, changed: List[str]) -> List[str]:
+    """List the changed files that a recursive search of the directory would find."""
+    base = os.path.realpath(directory)
+    selected = []
+    for path in sorted(changed):
+        relative = os.path.relpath(path, base)
+        parts = relative.split(os.sep)
+        if parts[0] == os.pardir or any(part.startswith(".") for part in parts[:-1]):
+            continue
+        if any(fnmatch.fnmatch(parts[-1], pattern) for pattern in CONFIG_FILE_PATTERNS):
+            selected.append(os.path.join(directory, relative))
+    return selected
+
+
+def _real_path(path: str) -> str:
+    """Normalize the path so that the paths of a file given by git and by the user are equal."""
+    return os.path.normcase(os.path.realpath(path))
+
+
+def _git(*args: str, cwd: Optional[str] = None, input: Optional[bytes] = None) -> bytes:
+    """Run the "git" command and return its standard output, raising "_GitError" if it fails."""
+    import subprocess
+
+    try:
+        process = subprocess.run(
+            ("git",) + args, cwd=cwd, input=input, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    except OSError as error:
+        raise _GitError(f"cannot run git: {error}") from error
+    if process.returncode != 0:
+        message = process.stderr.decode("utf-8", "replace").strip()
+        raise _GitError(message or f"'git {args[0]}' exited with status {process.returncode}")
+    return process.stdout
+
+
+def _git_root() -> str:
+    """Find the root directory of the working tree of the current git repository."""
+    return os.fsdecode(_git("rev-parse", "--show-toplevel").rstrip(b"\n"))
+
+
+def _find_changed_files(ref: str) -> List[str]:
+    """List the real paths of the files changed since the revision, or untracked.
+
+    Committed, staged and unstaged changes are all taken into account. Deleted files are not.
+    """
+    root = _git_root()
+    diff = _git("diff", "--name-only", "-z", "--no-renames", "--diff-filter=d", ref, "--", cwd=root)
+    untracked = _git("ls-files", "-z", "--others", "--exclude-standard", cwd=root)
+    names = set(diff.split(b"\0") + untracked.split(b"\0"))
+    names.discard(b"")
+    return [os.path.realpath(os.path.join(root, os.fsdecode(name))) for name in sorted(names)]
+
+
+def _find_staged_files() -> Dict[str, Tuple[str, str, str]]:
+    """Map the real paths of the regular files staged in the index to their git entry.
+
+    Each entry is made of the mode of the file, the identifier of its staged blob and its path
+    relative to the root of the repository. Deleted files are not listed.
+    """
+    root = _git_root()
+    output = _git(
+        "diff",
+        "--cached",
+        "--raw",
+        "-z",
+        "--no-abbrev",
+        "--no-renames",
+        "--diff-filter=d",
+        cwd=root,
+    )
+    fields = output.split(b"\0")
+    staged = {}
+    for metadata, name in zip(fields[0::2], fields[1::2]):
+        _, mode, _, blob, _ = metadata.decode("ascii").split()
+        if mode in ("100644", "100755"):  # Neither symbolic links nor submodules.
+            path = os.path.join(root, os.fsdecode(name))
+            staged[_real_path(path)] = (mode, blob, os.fsdecode(name))
+    return staged
+
+
+def _read_blobs(blobs: List[str]) -> List[bytes]:
+    """Read the content of the git blobs, all at once."""
+    if not blobs:
+        return []
+    output = _git("cat-file", "--batch", input="".join(f"{blob}\n" for blob in blobs).encode())
+    contents = []
+    position = 0
+    for blob in blobs:
+        header_end = output.index(b"\n", position)
+        header = output[position:header_end].decode("ascii").split()
+        if header[-1] == "missing":
+            raise _GitError(f"missing blob {blob}")
+        start = header_end + 1
+        end = start + int(header[2])
+        contents.append(output[start:end])
+        position = end + 1  # The content is followed by a newline character.
+    return contents
+
+
+def _format_blob(function: Callable, item: Tuple[str, bytes]) -> _FileResult:
+    """Apply the "_format_file()" function to the content of a file read from the git index."""
+    path, blob = item
+    return function(path, blob=blob)
+
+
+def _stage_file(result: _FileResult, entry: Tuple[str, str, str], blob: bytes) -> _FileResult:
+    """Write the formatted content of the staged file to the index and to the working tree.
+
+    Files having unstaged changes are left untouched, as these changes would be lost otherwise.
+    """
+    mode, _, name = entry
+    try:
+        with open(result.path, "rb") as file:
+            if file.read() != blob:
+                message = "the file has unstaged changes, stage or stash them first"
+                return _FileResult(result.path, "error", message)
+        _, encoding = detect_encoding(blob[:4])
+        data = result.formatted.encode(encoding)
+        root = _git_root()
+        new_blob = _git("hash-object", "-w", "--no-filters", "--stdin", input=data).decode()
+        _git("update-index", "--cacheinfo", f"{mode},{new_blob.strip()},{name}", cwd=root)
+        write_atomically(result.path, result.formatted, encoding=encoding)
+    except (OSError, _GitError) as error:
+        return _FileResult(result.path, "error", str(error))
+    return result._replace(formatted=None)
+
+
+def _skip_cached_files(
+    formatter: ConfigFormatter, cache: FormattingCache, paths: List[str]
+) -> Tuple[List[str], List[_FileResult]]:
+    """Separate the files needing to be formatted from those the cache knows to be formatted."""
+    remaining, cached = [], []
+    for path in paths:
+        try:
+            with open(path, "rb") as file:
+                _, _, content = _decode_file(file.read())
+        except (OSError, UnicodeDecodeError):
+            remaining.append(path)  # The error will be reported when formatting the file.
+            continue
+        # Keyed on the decoded text, as "prettify()" does: not on the bytes, whose line endings
+        # may differ from those of the formatted text.
+        digest = formatter.cache_key(content)
+        if digest in cache:
+            cached.append(_FileResult(path, "unchanged", digest=digest))
+        else:
+            remaining.append(path)
+    return remaining, cached
+
+
+def _format_file(
+    formatter: ConfigFormatter,
+    path: str,
+    *,
+    check: bool = False,
+    diff: bool = False,
+    stats: bool = False,
+    blob: Optional[bytes] = None,
+) -> _FileResult:
+    """Format the file in place, replacing it only if its content changed.
+
+    In "diff" mode, the file is left untouched and the unified diff of the changes is reported.
+    Otherwise, in "check" mode, the file is left untouched and the line of the first difference is
+    reported. If "stats" is set, the statistics recorded while formatting the file are attached
+    to the result.
+
+    If the content of the file is given as a "blob", it is formatted instead of the file, which is
+    not written: the formatted content is attached to the result, if it changed.
+    """
+    if not stats:
+        return _process_file(formatter, path, check=check, diff=diff, blob=blob)
+    file_stats = FormattingStats()
+    formatter = ConfigFormatter(engine=formatter.engine, stats=file_stats, verify=formatter.verify)
+    result = _process_file(formatter, path, check=check, diff=diff, blob=blob)
+    return result._replace(stats=file_stats)
+
+
+def _process_file(
+    formatter: ConfigFormatter,
+    path: str,
+    *,
+    check: bool,
+    diff: bool,
+    blob: Optional[bytes] = None,
+) -> _FileResult:
+    """Read the file and format it according to the mode, see "_format_file()".
+
+    As with "ConfigFormatter.prettify_file()", the encoding is detected from the byte order mark,
+    if any. The mark is preserved in the formatted content returned for a blob.
+    """
+    try:
+        if blob is None:
+            with open(path, "rb") as file:
+                data = file.read()
+        else:
+            data = blob
+        mark, encoding, content = _decode_file(data)
+        if diff:
+            text = formatter.prettify_diff(content, f"{path}\t(original)", f"{path}\t(formatted)")
+            if not text:
+                return _FileResult(path, "unchanged", digest=formatter.cache_key(content))
+            return _FileResult(path, "reformatted", diff=text)
+        if check:
+            lineno = formatter.check(content)
+            if lineno is None:
+                return _FileResult(path, "unchanged", digest=formatter.cache_key(content))
+            return _FileResult(path, "reformatted", str(lineno))
+        formatted = formatter.prettify(content)
+        if formatted == content:
+            return _FileResult(path, "unchanged", digest=formatter.cache_key(content))
+        if mark:
+            formatted = f"\ufeff{formatted}"  # Encoded as the original mark by the codec.
+        if blob is not None:
+            return _FileResult(path, "reformatted", formatted=formatted)
+        write_atomically(path, formatted, encoding=encoding)
+    except Exception as error:  # See "_prettify_or_error()", this must not abort the whole run.
+        return _FileResult(path, "error", str(error))
+    return _FileResult(path, "reformatted")
+
+
+def _decode_file(data: bytes) -> Tuple[bytes, str, str]:
+    """Decode the content of a file, returning its byte order mark, its encoding and its text.
+
+    The encoding is detected from the byte order mark, if any, and line endings are normalized.
+    """
+    mark, encoding = detect_encoding(data[:4])
+    start = len(mark)
+    return mark, encoding, io.StringIO(data[start:].decode(encoding), newline=None).read()
+
+
+def _run_daemon(
+    formatter: ConfigFormatter,
+    paths: Sequence[str],
+    *,
+    socket_path: Optional[str] = None,
+    check: bool = False,
+    diff: bool = False,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """Format the files again whenever they change, and serve requests on the socket, if any.
+
+    The same formatter is used all along, so that no set up is needed for each file or request.
+    Changes are detected using inotify on Linux, or by polling the modification times of the files
+    otherwise. See "_answer_request()" for the requests accepted by the server, which handles each
+    client in a separate thread. It runs until interrupted, or until "stop" is set.
+    """
+    if stop is None:
+        stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        import signal
+
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    server = None
+    if socket_path is not None:
+        listener = _listen(socket_path)
+        server = threading.Thread(
+            target=_serve, args=(formatter, listener, stop), name="config-formatter-server"
+        )
+        server.start()
+
+    watcher = _create_watcher(paths) if paths else None
+    try:
+        while not stop.is_set():
+            if watcher is None:
+                stop.wait(0.5)
+                continue
+            for path in watcher.wait(0.5):
+                result = _process_file(formatter, path, check=check, diff=diff)
+                _report_result(result, diff=diff)
+    finally:
+        stop.set()
+        if watcher is not None:
+            watcher.close()
+        if server is not None:
+            server.join()
+            os.unlink(socket_path)
+
+
+def _create_watcher(paths: Sequence[str]) -> Union["_InotifyWatcher", "_PollingWatcher"]:
+    """Create the most efficient watcher available on the platform."""
+    try:
+        return _InotifyWatcher(paths)
+    except (AttributeError, OSError):  # Not Linux, or too many watches.
+        return _PollingWatcher(paths)
+
+
+class _PollingWatcher:
+    """Detect changes of configuration files by periodically comparing their modification times.
+
+    Files are searched as by the command-line tool, each time the modification times are checked.
+    """
+
+    def __init__(self, paths: Sequence[str], interval: float = 1.0) -> None:
+        self._paths = paths
+        self._interval = interval
+        self._states = self._scan()
+
+    def _scan(self) -> dict:
+        """Find the files and get their modification time and size."""
+        states = {}
+        for path in _find_config_files(p for p in self._paths if os.path.exists(p)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            states[path] = (stat.st_mtime_ns, stat.st_size)
+        return states
+
+    def wait(self, timeout: float) -> List[str]:
+        """Wait for files to be modified or created, and return their paths (if any)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            time.sleep(max(0.0, min(self._interval, deadline - time.monotonic())))
+            states = self._scan()
+            changed = [path for path, state in states.items() if self._states.get(path) != state]
+            self._states = states
+            if changed or time.monotonic() >= deadline:
+                return changed
+
+    def close(self) -> None:
+        """Release the resources of the watcher."""
+
+
+class _InotifyWatcher:
+    """Detect changes of configuration files using the inotify API of Linux.
+
+    Directories are watched recursively, including those created afterwards. Files given explicitly
+    are watched through their parent directory, so that they're still watched if they're replaced
+    by another file (as editors and this tool do).
+    """
+
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _IN_Q_OVERFLOW = 0x00004000
+    _IN_IGNORED = 0x00008000
+    _IN_ISDIR = 0x40000000
+    _EVENT_HEADER_SIZE = 16  # The "wd", "mask", "cookie" and "len" fields of "inotify_event".
+
+    def __init__(self, paths: Sequence[str]) -> None:
+        import ctypes
+
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._get_errno = ctypes.get_errno
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = self._get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._paths = paths
+        self._directories = {}  # type: dict  # The directory and whether it is recursive, by wd.
+        self._files = {}  # type: dict  # The files given explicitly, by absolute path.
+        try:
+            for path in paths:
+                if os.path.isdir(path):
+                    self._watch_tree(path)
+                else:
+                    self._files[os.path.abspath(path)] = path
+                    self._watch(os.path.dirname(path) or os.curdir, recursive=False)
+        except BaseException:
+            self.close()
+            raise
+
+    def _watch(self, directory: str, *, recursive: bool) -> None:
+        """Start watching the directory, if not already done."""
+        mask = self._IN_CLOSE_WRITE | self._IN_MOVED_TO | self._IN_CREATE
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = self._get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        _, was_recursive = self._directories.get(wd, (None, False))
+        self._directories[wd] = (directory, recursive or was_recursive)
+
+    def _watch_tree(self, directory: str) -> List[str]:
+        """Watch the directory and its subdirectories, returning the files found in them."""
+        for root, dirnames, _ in os.walk(directory):
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            self._watch(root, recursive=True)
+        return _find_config_files([directory])
+
+    def wait(self, timeout: float) -> List[str]:
+        """Wait for files to be written or moved in, and return their paths (if any)."""
+        import select
+
+        changed = {}  # type: dict  # Used as an ordered set.
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return []
+
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+
+        position = 0
+        while position < len(data):
+            header_end = position + self._EVENT_HEADER_SIZE
+            wd, mask, _, length = struct.unpack("iIII", data[position:header_end])
+            position = header_end + length
+            name = os.fsdecode(data[header_end:position].rstrip(b"\0"))
+
+            if mask & self._IN_Q_OVERFLOW:
+                # Some events were lost, all files are reported as possibly changed.
+                existing_paths = [path for path in self._paths if os.path.exists(path)]
+                changed.update(dict.fromkeys(_find_config_files(existing_paths)))
+                continue
+            if mask & self._IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            if wd not in self._directories:
+                continue
+
+            directory, recursive = self._directories[wd]
+            path = os.path.join(directory, name)
+            if mask & self._IN_ISDIR:
+                if recursive and not name.startswith("."):
+                    changed.update(dict.fromkeys(self._watch_tree(path)))
+            elif mask & self._IN_CREATE:
+                continue  # The file is reported once written.
+            elif os.path.abspath(path) in self._files:
+                changed[self._files[os.path.abspath(path)]] = None
+            elif recursive and any(fnmatch.fnmatch(name, p) for p in CONFIG_FILE_PATTERNS):
+                changed[path] = None
+
+        return list(changed)
+
+    def close(self) -> None:
+        """Release the resources of the watcher."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def _listen(socket_path: str) -> "socket.socket":
+    """Create a Unix socket listening at the given path, replacing a stale socket if any."""
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix sockets are not supported on this platform")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            listener.bind(socket_path)
+        except OSError:
+            # The socket is left behind by a server which is no longer running.
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                try:
+                    client.connect(socket_path)
+                except ConnectionRefusedError:
+                    os.unlink(socket_path)
+                else:
+                    raise
+            listener.bind(socket_path)
+        os.chmod(socket_path, 0o600)
+        listener.listen()
+        listener.settimeout(0.5)
+    except BaseException:
+        listener.close()
+        raise
+    return listener
+
+
+def _serve(formatter: ConfigFormatter, listener: "socket.socket", stop: threading.Event) -> None:
+    """Accept connections on the listening socket until "stop" is set, one thread per client."""
+    import socket
+
+    with listener:
+        while not stop.is_set():
+            try:
+                connection, _ = listener.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(None)
+            threading.Thread(
+                target=_handle_connection, args=(formatter, connection), daemon=True
+            ).start()
+
+
+def _handle_connection(formatter: ConfigFormatter, connection: "socket.socket") -> None:
+    """Answer the requests of a client, each request being a JSON object on a single line."""
+    with connection, connection.makefile("rb") as reader, connection.makefile("wb") as writer:
+        for line in reader:
+            response = _answer_request(formatter, line)
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            writer.flush()
+
+
+def _answer_request(formatter: ConfigFormatter, line: bytes) -> dict:
+    """Process a request received by the server and return the response.
+
+    The request "{"content": ...}" is answered by "{"formatted": ...}", the formatted content. The
+    request "{"path": ...}" formats the file in place (or only checks it if "check" is true), and
+    is answered by "{"status": ..., "message": ...}" as reported by the command-line tool. Relative
+    paths are resolved from the working directory of the server. Invalid requests and
+    configurations are answered by "{"error": ...}".
+    """
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("The request must be a JSON object")
+        for key in ("content", "path"):
+            if key in request and not isinstance(request[key], str):
+                raise ValueError(f"The '{key}' of the request must be a string")
+        if "content" in request:
+            return {"formatted": formatter.prettify(request["content"])}
+        if "path" in request:
+            check = bool(request.get("check", False))
+            result = _process_file(formatter, request["path"], check=check, diff=False)
+            return {"status": result.status, "message": result.message}
+        raise ValueError("The request must contain either 'content' or 'path'")
+    except Exception as error:  # See "_prettify_or_error()".
+        return {"error": str(error)}
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import random
+import re
+from typing import Callable, Sequence
+
+import pytest
+
+# A sample of the lines making up configurations: sections, options, continuation lines, comments
+# and blank lines, indented or not. Tests focusing on edge cases add their own lines to these.
+FRAGMENTS = (
+    "[a]",
+    "[b]",
+    "  [c]",
+    "[d]  # c",
+    "k = v",
+    "key: value",
+    "k=",
+    "  key: value",
+    "  a",
+    "    b",
+    "   continuation",
+    "# c",
+    "  ; c",
+    "",
+    " ",
+)
+
+_NAME_REGEX = re.compile(r"^(\s*)(\[|[^\s=:\[]+(?=\s*[=:]))")
+
+
+def _generate_config(
+    rng: random.Random,
+    *,
+    extra: Sequence[str] = (),
+    max_lines: int = 15,
+    unique: bool = False,
+    valid: bool = False,
+    endings: Sequence[str] = ("",),
+) -> str:
+    """Join random lines into a configuration, followed by one of the given endings.
+
+    Comments are numbered, as the "configupdater" engine locates blocks by equality and thus
+    mishandles identical ones. If "unique" is set, the sections and options are numbered too, so
+    that they're not duplicated. If "valid" is set, continuation lines are only generated after an
+    option, so that (along with "unique") the configuration can be parsed.
+    """
+    fragments = FRAGMENTS + tuple(extra)
+    lines = []
+    option_indent = None
+    for i in range(rng.randint(0, max_lines)):
+        line = rng.choice(fragments)
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+        if "#" in line or ";" in line:
+            line += f" {i}"
+        if stripped[:1] in ("", "#", ";") or option_indent is not None and indent > option_indent:
+            pass  # Blank lines, comments and continuation lines.
+        elif stripped.startswith("["):
+            option_indent = None
+        elif "=" in line or ":" in line:
+            option_indent = indent
+        elif valid:
+            continue
+        if unique:
+            line = _NAME_REGEX.sub(rf"\g<0>{i}_", line)
+        lines.append(line)
+    return "\n".join(lines) + rng.choice(endings)
+
+
+@pytest.fixture
+def generate_config() -> Callable[..., str]:
+    """Provide the function generating random configurations, see "_generate_config()"."""
+    return _generate_config
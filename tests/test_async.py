@@ -0,0 +1,163 @@
+import asyncio
+import pickle
+import threading
+from configparser import DuplicateSectionError, ParsingError
+
+import pytest
+
+from config_formatter import ConfigFormatter, FormattingCache
+
+SMALL = "[section]\nkey=value\n"
+LARGE = "".join(f"[section{i}]\nkey={i}\n" for i in range(1000))
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def threads(monkeypatch):
+    names = []
+    original_prettify = ConfigFormatter.prettify
+
+    def prettify(self, string):
+        names.append(threading.current_thread().name)
+        return original_prettify(self, string)
+
+    monkeypatch.setattr(ConfigFormatter, "prettify", prettify)
+    return names
+
+
+@pytest.mark.parametrize("engine", ["native", "configupdater"])
+def test_aprettify(engine: str):
+    formatter = ConfigFormatter(engine=engine)
+    try:
+        assert run(formatter.aprettify(SMALL)) == formatter.prettify(SMALL)
+        assert run(formatter.aprettify(LARGE)) == formatter.prettify(LARGE)
+    finally:
+        formatter.close()
+
+
+def test_small_configuration_formatted_inline(threads):
+    formatter = ConfigFormatter()
+    run(formatter.aprettify(SMALL))
+    assert threads == [threading.current_thread().name]
+    assert formatter._executor is None
+
+
+def test_large_configuration_formatted_in_thread(threads):
+    formatter = ConfigFormatter()
+    try:
+        run(formatter.aprettify(LARGE))
+    finally:
+        formatter.close()
+    assert len(threads) == 1
+    assert threads[0].startswith("config-formatter")
+
+
+def test_inline_threshold(threads):
+    formatter = ConfigFormatter(inline_threshold=0)
+    try:
+        run(formatter.aprettify(""))
+    finally:
+        formatter.close()
+    assert threads[0].startswith("config-formatter")
+
+
+def test_aprettify_raises_error():
+    formatter = ConfigFormatter(inline_threshold=0)
+    try:
+        with pytest.raises(ParsingError):
+            run(formatter.aprettify("[section]\ninvalid\n"))
+    finally:
+        formatter.close()
+
+
+def test_aprettify_many():
+    formatter = ConfigFormatter(max_workers=2)
+    configs = [SMALL, LARGE, "[section]\ninvalid\n", "[a]\n[a]\n" + LARGE, "", LARGE + SMALL]
+    try:
+        results = run(formatter.aprettify_many(iter(configs)))
+    finally:
+        formatter.close()
+    assert results[:2] == [formatter.prettify(SMALL), formatter.prettify(LARGE)]
+    assert isinstance(results[2], ParsingError)
+    assert isinstance(results[3], DuplicateSectionError)
+    assert results[4:] == ["\n", formatter.prettify(LARGE + SMALL)]
+
+
+def test_aprettify_many_unexpected_error():
+    formatter = ConfigFormatter(engine="configupdater")
+    config = "# c\nx =\n\n# c\n    # ind comment\n\t\n  \n  k2=v"
+    results = run(formatter.aprettify_many([SMALL, config]))
+    assert results[0] == formatter.prettify(SMALL)
+    assert isinstance(results[1], Exception)
+
+
+def test_aprettify_many_limits_concurrency(monkeypatch):
+    lock = threading.Lock()
+    running, maximum = [0], [0]
+    original_prettify = ConfigFormatter.prettify
+
+    def prettify(self, string):
+        with lock:
+            running[0] += 1
+            maximum[0] = max(maximum[0], running[0])
+        try:
+            return original_prettify(self, string)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    monkeypatch.setattr(ConfigFormatter, "prettify", prettify)
+    formatter = ConfigFormatter(max_workers=2, inline_threshold=0)
+    try:
+        results = run(formatter.aprettify_many([LARGE] * 20))
+    finally:
+        formatter.close()
+    assert results == [formatter.prettify(LARGE)] * 20
+    assert maximum[0] <= 2
+
+
+def test_shared_cache(tmp_path):
+    cache = FormattingCache(str(tmp_path / "cache.txt"), max_size=10)
+    formatter = ConfigFormatter(cache=cache, max_workers=4, inline_threshold=0)
+    configs = [f"[section{i}]\nkey = {i}\n" for i in range(100)] * 3
+    try:
+        assert run(formatter.aprettify_many(configs)) == configs
+    finally:
+        formatter.close()
+    assert len(cache) == 10
+
+
+def test_close_then_reuse():
+    formatter = ConfigFormatter(inline_threshold=0)
+    formatter.close()
+    assert run(formatter.aprettify(SMALL)) == formatter.prettify(SMALL)
+    formatter.close()
+    assert formatter._executor is None
+
+
+def test_pickle_formatter_with_executor():
+    formatter = ConfigFormatter(inline_threshold=0)
+    try:
+        run(formatter.aprettify(SMALL))
+        copy = pickle.loads(pickle.dumps(formatter))
+    finally:
+        formatter.close()
+    assert copy._executor is None
+    assert run(copy.aprettify(SMALL)) == formatter.prettify(SMALL)
+    copy.close()
+
+
+@pytest.mark.parametrize(
+    "kwargs, message",
+    [({"max_workers": 0}, "Invalid number of workers"), ({"inline_threshold": -1}, "threshold")],
+)
+def test_invalid_parameters(kwargs, message: str):
+    with pytest.raises(ValueError, match=message):
+        ConfigFormatter(**kwargs)
@@ -0,0 +1,97 @@
+import pytest
+
+import config_formatter
+from config_formatter import ConfigFormatter, FormattingCache
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "formatted.txt")
+
+
+def test_cache_persisted(cache_path):
+    cache = FormattingCache(cache_path)
+    cache.add("abc")
+    cache.add("def")
+    assert "abc" in cache
+    assert "xyz" not in cache
+    cache.save()
+
+    cache = FormattingCache(cache_path)
+    assert len(cache) == 2
+    assert "abc" in cache
+    assert "def" in cache
+
+
+def test_cache_not_saved_if_unmodified(cache_path):
+    FormattingCache(cache_path).save()
+    with pytest.raises(FileNotFoundError):
+        open(cache_path)
+
+
+def test_cache_evicts_least_recently_used_entries(cache_path):
+    cache = FormattingCache(cache_path, max_size=3)
+    cache.add("a")
+    cache.add("b")
+    cache.add("c")
+    assert "a" in cache
+    cache.add("d")
+    assert len(cache) == 3
+    assert "b" not in cache
+    cache.save()
+
+    cache = FormattingCache(cache_path, max_size=2)
+    assert len(cache) == 2
+    assert "a" in cache
+    assert "d" in cache
+
+
+def test_cache_clear(cache_path):
+    cache = FormattingCache(cache_path)
+    cache.add("a")
+    cache.save()
+    cache.clear()
+    cache.save()
+    assert len(FormattingCache(cache_path)) == 0
+
+
+def test_corrupted_cache_ignored(tmp_path):
+    path = tmp_path / "formatted.txt"
+    path.write_bytes(b"\xff\xfe\x00")
+    assert len(FormattingCache(str(path))) == 0
+
+
+def test_default_cache_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("CONFIG_FORMATTER_CACHE_DIR", str(tmp_path))
+    assert FormattingCache().path == str(tmp_path / "formatted.txt")
+
+
+@pytest.mark.parametrize("max_size", [0, -1])
+def test_invalid_cache_size(cache_path, max_size: int):
+    with pytest.raises(ValueError, match="Invalid cache size"):
+        FormattingCache(cache_path, max_size=max_size)
+
+
+def test_formatter_with_cache_skips_formatted_configs(cache_path, monkeypatch):
+    cache = FormattingCache(cache_path)
+    formatter = ConfigFormatter(cache=cache)
+    assert formatter.prettify("[section]\nkey=value") == "[section]\nkey = value\n"
+    assert len(cache) == 0
+    assert formatter.prettify("[section]\nkey = value\n") == "[section]\nkey = value\n"
+    assert len(cache) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The configuration should not be parsed")
+
+    monkeypatch.setattr(ConfigFormatter, "_iter_prettify", fail)
+    assert formatter.prettify("[section]\nkey = value\n") == "[section]\nkey = value\n"
+
+
+def test_cache_entries_depend_on_version_and_engine(monkeypatch):
+    native, reference = ConfigFormatter(engine="native"), ConfigFormatter(engine="configupdater")
+    digest = native.cache_key("[section]\n")
+    assert native.cache_key("[section]\n") == digest
+    assert native.cache_key("[other]\n") != digest
+    assert reference.cache_key("[section]\n") != digest
+    monkeypatch.setattr(config_formatter, "__version__", "0.0.0")
+    assert native.cache_key("[section]\n") != digest
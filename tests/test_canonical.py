@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from config_formatter import ENGINES, ConfigFormatter, FormattingStats
+
+CANONICAL = [
+    "\n",
+    "[section]\n",
+    "key = value\n",
+    "# Header.\n\n[section]  # Comment.\nkey = value\nempty =\n\n; Footer.\n",
+    "[section]\nlist =\n    a\n\n\n    # Comment.\n    b\nkey = first\n      second\n",
+    "[section]\nkey = value\n# Comment.\n[other]\nkey = value\n",
+    "[a]\nkey = x = y: z\n[[b]]  ; Comment.\n",
+]
+
+NOT_CANONICAL = [
+    "",
+    "\n\n",
+    "\n[section]\n",
+    "[section]",
+    "[section]\n\n",
+    "[section]\n\n\nkey = value\n",
+    "[section] \n",
+    "[section] # Comment.\n",
+    "  [section]\n",
+    "[section]\nkey=value\n",
+    "[section]\nkey  = value\n",
+    "[section]\nkey: value\n",
+    "[section]\nkey = value \n",
+    "[section]\nlist =\n  a\n",
+    "[section]\nlist =\n     a\n",
+    "[section]\nkey = first\n    second\n",
+    "[section]\nlist =\n\tb\n",
+    "[section]\nlist =\n    a\n\n\n",
+    "[section]\nlist =\n    a\n \n    b\n",
+    "[section]\nlist =\n    a\n# Comment.\n    b\n",
+    "[section]\nlist =\n    a\x0cb\n",
+    "key = value\n    \n",
+]
+
+INVALID = ["[section]\nkey = 1\nkey = 2\n", "[section]\n[section]\n", "[section]\ninvalid\n"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("config", CANONICAL)
+def test_canonical_input_returned_unchanged(monkeypatch, engine: str, config: str):
+    formatter = ConfigFormatter(engine=engine)
+    monkeypatch.setattr(formatter, "_iter_formatted", None)
+    assert formatter.prettify(config) is config
+    assert formatter.check(config) is None
+
+
+@pytest.mark.parametrize("config", NOT_CANONICAL)
+def test_other_input_formatted(config: str):
+    formatter = ConfigFormatter()
+    assert not formatter._is_canonical(config)
+    assert formatter.prettify(config) == "".join(formatter._iter_formatted(config))
+
+
+@pytest.mark.parametrize("config", INVALID)
+def test_invalid_input_is_not_canonical(config: str):
+    assert not ConfigFormatter()._is_canonical(config)
+
+
+def test_canonical_input_accounted_in_stats():
+    stats = FormattingStats()
+    ConfigFormatter(stats=stats).prettify(CANONICAL[3])
+    assert stats.configurations == 1
+    assert stats.blocks["option"] == 2
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_canonical_input_is_formatted(generate_config, seed: int):
+    rng = random.Random(seed)
+    formatter = ConfigFormatter()
+    for _ in range(500):
+        config = generate_config(rng, extra=["k =", "      b"], endings=["", "\n", "\n\n"])
+        if formatter._is_canonical(config):
+            assert "".join(formatter._iter_formatted(config)) == config
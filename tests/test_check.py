@@ -0,0 +1,62 @@
+import random
+from configparser import ParsingError
+from typing import Optional
+
+import pytest
+
+from config_formatter import ENGINES, ConfigFormatter
+
+
+def first_difference(string: str, formatted: str) -> Optional[int]:
+    if string == formatted:
+        return None
+    lines, formatted_lines = string.split("\n"), formatted.split("\n")
+    for lineno, (line, formatted_line) in enumerate(zip(lines, formatted_lines), start=1):
+        if line != formatted_line:
+            return lineno
+    return min(len(lines), len(formatted_lines))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "string, expected",
+    [
+        ("\n", None),
+        ("[section]\n", None),
+        ("[section]\nkey = value\nlist =\n    a\n    b\n", None),
+        ("", 1),
+        ("[section]", 1),
+        ("\n[section]\n", 1),
+        ("[section]\nkey = value\n\n", 3),
+        ("[section]\nkey = value\nlist =\n    a\n  b\n", 5),
+        ("[section]\nkey = value\nkey2=value\n", 3),
+        ("[section]  # Comment.\nkey = value\r\n", 2),
+    ],
+)
+def test_check(engine: str, string: str, expected: Optional[int]):
+    formatter = ConfigFormatter(engine=engine)
+    assert formatter.check(string) == expected
+    assert formatter.is_formatted(string) is (expected is None)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_check_consistent_with_prettify(generate_config, engine: str):
+    rng = random.Random(0)
+    formatter = ConfigFormatter(engine=engine)
+    for _ in range(1000):
+        string = generate_config(rng, max_lines=8, unique=True, endings=["", "\n", "\n\n"])
+        try:
+            formatted = formatter.prettify(string)
+        except Exception:
+            continue
+        assert formatter.check(string) == first_difference(string, formatted), string
+        if formatter.prettify(formatted) == formatted:  # Unless the formatting isn't idempotent.
+            assert formatter.check(formatted) is None
+
+
+def test_check_stops_at_first_difference():
+    string = "[section]\nkey=value\n" + "invalid line\n" * 1000
+    formatter = ConfigFormatter(engine="native")
+    assert formatter.check(string) == 2
+    with pytest.raises(ParsingError):
+        formatter.prettify(string)
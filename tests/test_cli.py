@@ -0,0 +1,247 @@
+import json
+import os
+import stat
+from typing import List
+
+import pytest
+
+import config_formatter
+from config_formatter import FormattingCache
+from config_formatter_cli import main
+
+UNFORMATTED = "[section]\nkey=value\nlist=\n a\n b\n"
+FORMATTED = "[section]\nkey = value\nlist =\n    a\n    b\n"
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    directory = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("CONFIG_FORMATTER_CACHE_DIR", str(directory))
+    return directory
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "setup.cfg").write_text(UNFORMATTED)
+    (tmp_path / "tox.ini").write_text(FORMATTED)
+    (tmp_path / "README.md").write_text(UNFORMATTED)
+    (tmp_path / "sub" / "deep").mkdir(parents=True)
+    (tmp_path / "sub" / "a.cfg").write_text(UNFORMATTED)
+    (tmp_path / "sub" / "deep" / "b.ini").write_text(UNFORMATTED)
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "c.cfg").write_text(UNFORMATTED)
+    return tmp_path
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_format_directory(tree, capsys, jobs: str):
+    assert main(["--jobs", jobs, str(tree)]) == 0
+    assert (tree / "setup.cfg").read_text() == FORMATTED
+    assert (tree / "tox.ini").read_text() == FORMATTED
+    assert (tree / "sub" / "a.cfg").read_text() == FORMATTED
+    assert (tree / "sub" / "deep" / "b.ini").read_text() == FORMATTED
+    assert (tree / "README.md").read_text() == UNFORMATTED
+    assert (tree / ".hidden" / "c.cfg").read_text() == UNFORMATTED
+
+    err = capsys.readouterr().err
+    assert f"reformatted {tree / 'sub' / 'a.cfg'}" in err
+    assert "3 file(s) reformatted, 1 file(s) left unchanged." in err
+
+
+def test_format_explicit_file_whatever_its_name(tree, capsys):
+    path = tree / "README.md"
+    assert main([str(path)]) == 0
+    assert path.read_text() == FORMATTED
+    assert "1 file(s) reformatted, 0 file(s) left unchanged." in capsys.readouterr().err
+
+
+def test_file_listed_twice_is_formatted_once(tree, capsys):
+    path = tree / "setup.cfg"
+    assert main(["--jobs", "2", str(path), str(tree), str(path)]) == 0
+    assert "3 file(s) reformatted, 1 file(s) left unchanged." in capsys.readouterr().err
+
+
+def test_unchanged_file_is_not_rewritten(tree):
+    path = tree / "tox.ini"
+    os.utime(path, (0, 0))
+    assert main([str(path)]) == 0
+    assert path.stat().st_mtime == 0
+
+
+def test_file_permissions_are_preserved(tree):
+    path = tree / "setup.cfg"
+    path.chmod(0o640)
+    assert main([str(path)]) == 0
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+    assert [p.name for p in tree.iterdir() if p.name.startswith(".setup.cfg")] == []
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_invalid_file_reported(tree, capsys, jobs: str):
+    invalid = tree / "sub" / "invalid.cfg"
+    invalid.write_text("[section]\nkey = 1\nkey = 2\n")
+    assert main(["-j", jobs, str(tree)]) == 1
+    assert invalid.read_text() == "[section]\nkey = 1\nkey = 2\n"
+    assert (tree / "sub" / "a.cfg").read_text() == FORMATTED
+
+    err = capsys.readouterr().err
+    assert f"error: cannot format {invalid}: " in err
+    assert "1 file(s) failed to reformat." in err
+
+
+def test_unexpected_error_reported(tree, capsys):
+    invalid = tree / "sub" / "invalid.cfg"
+    invalid.write_text("# c\nx =\n\n# c\n    # ind comment\n\t\n  \n  k2=v")
+    assert main(["--engine", "configupdater", str(tree)]) == 1
+    assert (tree / "sub" / "a.cfg").read_text() == FORMATTED
+    assert f"error: cannot format {invalid}: " in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("encoding", ["utf-8-sig", "utf-16"])
+def test_byte_order_mark_preserved(tmp_path, capsys, encoding: str):
+    path = tmp_path / "setup.cfg"
+    path.write_bytes(UNFORMATTED.encode(encoding))
+    assert main([str(path)]) == 0
+    assert path.read_bytes() == FORMATTED.encode(encoding)
+    assert main(["--check", str(path)]) == 0
+
+
+def test_missing_path(tmp_path, capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        main([str(tmp_path / "missing.cfg")])
+    assert excinfo.value.code == 2
+    assert "no such file or directory" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("jobs", ["0", "-1"])
+def test_invalid_jobs(tmp_path, jobs: str):
+    with pytest.raises(SystemExit) as excinfo:
+        main(["--jobs", jobs, str(tmp_path)])
+    assert excinfo.value.code == 2
+
+
+@pytest.fixture
+def prettify_calls(monkeypatch):
+    calls = []
+    original_prettify = config_formatter.ConfigFormatter.prettify
+
+    def prettify(self, string):
+        calls.append(string)
+        return original_prettify(self, string)
+
+    monkeypatch.setattr(config_formatter.ConfigFormatter, "prettify", prettify)
+    return calls
+
+
+def test_cache_skips_already_formatted_files(tree, capsys, prettify_calls):
+    (tree / "other.ini").write_text("[other]\n")
+    assert main(["-j", "1", str(tree)]) == 0
+    assert len(prettify_calls) == 5
+    assert len(FormattingCache()) == 2
+
+    # All the reformatted files now share the same content, which is already known.
+    assert main(["-j", "1", str(tree)]) == 0
+    assert len(prettify_calls) == 5
+    assert len(FormattingCache()) == 2
+
+    err = capsys.readouterr().err
+    assert err.splitlines()[-1] == "0 file(s) reformatted, 5 file(s) left unchanged."
+
+
+def test_cache_detects_modified_files(tree, capsys, prettify_calls):
+    assert main(["-j", "1", str(tree)]) == 0
+    assert main(["-j", "1", str(tree)]) == 0
+    (tree / "tox.ini").write_text(UNFORMATTED)
+    assert main(["-j", "1", str(tree)]) == 0
+    assert prettify_calls[-1] == UNFORMATTED
+    assert (tree / "tox.ini").read_text() == FORMATTED
+
+
+def test_no_cache(tree, cache_dir, prettify_calls):
+    assert main(["-j", "1", "--no-cache", str(tree)]) == 0
+    assert main(["-j", "1", "--no-cache", str(tree)]) == 0
+    assert len(prettify_calls) == 8
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_cache_depends_on_engine(tree, prettify_calls):
+    assert main(["-j", "1", "--engine", "native", str(tree / "tox.ini")]) == 0
+    assert main(["-j", "1", "--engine", "configupdater", str(tree / "tox.ini")]) == 0
+    assert main(["-j", "1", "--engine", "native", str(tree / "tox.ini")]) == 0
+    assert main(["-j", "1", "--engine", "configupdater", str(tree / "tox.ini")]) == 0
+    assert len(prettify_calls) == 2
+
+
+def test_cache_shared_with_library(tmp_path):
+    content = "a = b\r\n[s]\r\nk = v\r\n"
+    (tmp_path / "x.ini").write_bytes(content.encode())
+    assert main([str(tmp_path / "x.ini")]) == 0
+    formatter = config_formatter.ConfigFormatter(cache=FormattingCache())
+    assert formatter.prettify(content) == "a = b\n[s]\nk = v\n"
+    assert not formatter.is_formatted(content)
+    assert formatter.is_formatted("a = b\n[s]\nk = v\n")
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_check(tree, capsys, jobs: str):
+    assert main(["--check", "-j", jobs, str(tree)]) == 1
+    assert (tree / "setup.cfg").read_text() == UNFORMATTED
+    assert (tree / "sub" / "a.cfg").read_text() == UNFORMATTED
+
+    err = capsys.readouterr().err
+    assert f"would reformat {tree / 'setup.cfg'} (line 2)" in err
+    assert "3 file(s) would be reformatted, 1 file(s) would be left unchanged." in err
+
+
+def test_check_formatted_files(tree, capsys):
+    assert main([str(tree)]) == 0
+    assert main(["--check", str(tree)]) == 0
+    summary = capsys.readouterr().err.splitlines()[-1]
+    assert summary == "0 file(s) would be reformatted, 4 file(s) would be left unchanged."
+
+
+def test_diff(tree, capsys):
+    assert main(["--diff", "-j", "1", str(tree / "setup.cfg"), str(tree / "tox.ini")]) == 0
+    assert (tree / "setup.cfg").read_text() == UNFORMATTED
+
+    out, err = capsys.readouterr()
+    path = tree / "setup.cfg"
+    assert out == (
+        f"--- {path}\t(original)\n+++ {path}\t(formatted)\n@@ -1,5 +1,5 @@\n"
+        " [section]\n-key=value\n-list=\n- a\n- b\n+key = value\n+list =\n+    a\n+    b\n"
+    )
+    assert f"would reformat {path}\n" in err
+    assert "1 file(s) would be reformatted, 1 file(s) would be left unchanged." in err
+
+
+def test_diff_with_check(tree, capsys):
+    assert main(["--diff", "--check", str(tree / "setup.cfg")]) == 1
+    assert (tree / "setup.cfg").read_text() == UNFORMATTED
+    assert capsys.readouterr().out.startswith(f"--- {tree / 'setup.cfg'}\t(original)\n")
+
+
+@pytest.mark.parametrize("mode", [[], ["--diff"]])
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_stats(tree, capsys, jobs: str, mode: List[str]):
+    assert main(["--stats", "-j", jobs, *mode, str(tree)]) == 0
+    err = capsys.readouterr().err
+    start = err.index("{")
+    stats = json.loads(err[start:])
+    assert stats["configurations"] == 4
+    assert stats["characters"] == 3 * len(UNFORMATTED) + len(FORMATTED)
+    assert stats["blocks"] == {"section": 4, "option": 8, "comment": 0, "space": 0}
+    assert set(stats["timings"]) == {"strip", "tokenize"}
+
+
+@pytest.mark.parametrize("mode", [[], ["--check"], ["--diff"]])
+def test_verify(tree, capsys, mode: List[str]):
+    altered = tree / "altered.cfg"
+    altered.write_text("[section]\nkey = value\n\n# Comment.\n\n  continuation\n")
+    assert main(["--verify", *mode, str(tree)]) == 1
+    assert altered.read_text() == "[section]\nkey = value\n\n# Comment.\n\n  continuation\n"
+    assert (tree / "setup.cfg").read_text() == (UNFORMATTED if mode else FORMATTED)
+
+    out, err = capsys.readouterr()
+    assert f"error: cannot format {altered}: The output is not semantically identical" in err
+    assert "continuation" not in out
+    assert "1 file(s) failed to reformat." in err
@@ -0,0 +1,127 @@
+import difflib
+import random
+from configparser import Error, ParsingError
+from typing import List
+
+import pytest
+
+from config_formatter import ENGINES, ConfigFormatter, TextEdit
+
+
+def apply_edits(text: str, edits: List[TextEdit]) -> str:
+    output, position = [], 0
+    for start, end, replacement in edits:
+        assert start >= position
+        output += [text[position:start], replacement]
+        position = end
+    output.append(text[position:])
+    return "".join(output)
+
+
+@pytest.mark.parametrize(
+    "string", ["\n", "[section]\n", "[section]\nkey = value\nlist =\n    a\n    b\n"]
+)
+def test_formatted_string_has_no_edits(string: str):
+    formatter = ConfigFormatter()
+    assert formatter.prettify_edits(string) == []
+    assert formatter.prettify_diff(string) == ""
+
+
+def test_edits_replace_changed_lines_only():
+    string = "[section]\nkey=value\nother = value\nlist =\n    a\n  b\n"
+    edits = ConfigFormatter().prettify_edits(string)
+    position = string.index("key=value")
+    position_b = string.index("  b")
+    assert edits == [
+        TextEdit(position, position + 10, "key = value\n"),
+        TextEdit(position_b, position_b + 4, "    b\n"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "string, expected",
+    [
+        ("", "\n"),
+        ("\n\n  \n", "\n"),
+        ("\n\n[section]\n", "[section]\n"),
+        ("[section]\n\n\n\nkey = value\n", "[section]\n\nkey = value\n"),
+        ("[section]\nkey = value\n\n  \n", "[section]\nkey = value\n"),
+        ("[section]\nkey = value", "[section]\nkey = value\n"),
+        ("[section]\nkey =\n\n  a\n\n# Comment.\n", "[section]\nkey =\n\n    a\n\n# Comment.\n"),
+    ],
+)
+def test_edits_give_formatted_output(string: str, expected: str):
+    assert apply_edits(string, ConfigFormatter().prettify_edits(string)) == expected
+
+
+def test_unified_diff():
+    string = "[section]\nkey=value\nb = 1\nc = 2\nd = 3\ne = 4\nf = 5\ng = 6\nh = 7\ni=8"
+    diff = ConfigFormatter().prettify_diff(string, "old.cfg", "new.cfg")
+    assert diff == (
+        "--- old.cfg\n"
+        "+++ new.cfg\n"
+        "@@ -1,5 +1,5 @@\n"
+        " [section]\n"
+        "-key=value\n"
+        "+key = value\n"
+        " b = 1\n"
+        " c = 2\n"
+        " d = 3\n"
+        "@@ -7,4 +7,4 @@\n"
+        " f = 5\n"
+        " g = 6\n"
+        " h = 7\n"
+        "-i=8\n"
+        "\\ No newline at end of file\n"
+        "+i = 8\n"
+    )
+
+
+def test_unified_diff_matches_difflib_for_line_replacements():
+    string = "".join(f"[section{i}]\nkey{i}={i}\nlist =\n    a\n    b\n\n" for i in range(20))
+    formatted = ConfigFormatter().prettify(string)
+    expected = difflib.unified_diff(
+        string.splitlines(keepends=True), formatted.splitlines(keepends=True), "a", "b"
+    )
+    assert ConfigFormatter().prettify_diff(string, "a", "b") == "".join(expected)
+
+
+@pytest.mark.parametrize("engine", ["native", "configupdater"])
+def test_invalid_configuration(engine: str):
+    with pytest.raises(ParsingError):
+        ConfigFormatter(engine=engine).prettify_edits("[section]\nkey = value\ninvalid\n")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("seed", range(5))
+def test_edits_are_consistent_with_prettify(generate_config, engine: str, seed: int):
+    rng = random.Random(seed)
+    formatter = ConfigFormatter(engine=engine)
+
+    for _ in range(300):
+        string = generate_config(rng, max_lines=20, endings=["", "\n", "\n\n"])
+        try:
+            expected = formatter.prettify(string)
+        except Error:
+            continue
+        edits = formatter.prettify_edits(string)
+        assert apply_edits(string, edits) == expected
+        assert all(edit.end < next_edit.start for edit, next_edit in zip(edits, edits[1:]))
+        assert (formatter.prettify_diff(string) == "") is (string == expected)
+
+
+def test_edits_computed_by_configupdater_engine(monkeypatch):
+    loaded = []
+    original_load_config = ConfigFormatter._load_config
+
+    def load_config(self, string):
+        loaded.append(string)
+        return original_load_config(self, string)
+
+    monkeypatch.setattr(ConfigFormatter, "_load_config", load_config)
+    formatter = ConfigFormatter(engine="configupdater")
+    assert (
+        formatter.prettify_diff("[a]\nk=v\n", "a", "b")
+        == "--- a\n+++ b\n@@ -1,2 +1,2 @@\n [a]\n-k=v\n+k = v\n"
+    )
+    assert len(loaded) == 1
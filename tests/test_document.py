@@ -0,0 +1,129 @@
+import pickle
+import random
+from configparser import ConfigParser, NoOptionError, NoSectionError
+
+import pytest
+
+from config_formatter import ConfigBlock, ConfigDocument, ConfigFormatter
+
+CONFIG = """
+# Header.
+; Other.
+
+[main]  # Comment.
+key:value
+List=
+  a
+  # Inner.
+
+  b
+
+# Footer.
+[other]
+key = value
+"""
+
+
+def test_blocks():
+    document = ConfigFormatter().parse(CONFIG)
+    assert isinstance(document, ConfigDocument)
+    assert len(document) == 9
+    assert [(block.kind, block.first_lineno, block.last_lineno) for block in document] == [
+        ("comment", 2, 3),
+        ("space", 4, 4),
+        ("section", 5, 5),
+        ("option", 6, 6),
+        ("option", 7, 11),
+        ("space", 12, 12),
+        ("comment", 13, 13),
+        ("section", 14, 14),
+        ("option", 15, 15),
+    ]
+    assert [block.section for block in document] == [None, None] + ["main"] * 5 + ["other"] * 2
+    assert [block.name for block in document] == [
+        None,
+        None,
+        "main",
+        "key",
+        "List",
+        None,
+        None,
+        "other",
+        "key",
+    ]
+    assert document.blocks[0].text == "# Header.\n; Other.\n"
+    assert document.blocks[4].text == "List =\n    a\n    # Inner.\n\n    b\n"
+
+
+def test_render():
+    document = ConfigFormatter().parse(CONFIG)
+    assert document.render() == ConfigFormatter().prettify(CONFIG)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_render_random_configs(generate_config, seed: int):
+    rng = random.Random(seed)
+    formatter = ConfigFormatter()
+    for _ in range(200):
+        config = generate_config(rng)
+        try:
+            expected = formatter.prettify(config)
+        except Exception as error:
+            with pytest.raises(type(error)):
+                formatter.parse(config)
+        else:
+            assert formatter.parse(config).render() == expected, config
+
+
+def test_lookup():
+    document = ConfigFormatter().parse(CONFIG)
+    parser = ConfigParser()
+    parser.read_string(CONFIG)
+    assert document.sections() == parser.sections()
+    assert document.options("main") == ["key", "List"]
+    assert document.get("main", "list") == parser.get("main", "list") == "\na\n\nb"
+    assert document.get("main", "KEY") == "value"
+    assert document.get("other", "key") == "value"
+    assert document.blocks[0].value is None
+
+
+def test_lookup_errors():
+    document = ConfigFormatter().parse(CONFIG)
+    with pytest.raises(NoSectionError):
+        document.options("missing")
+    with pytest.raises(NoSectionError):
+        document.get("missing", "key")
+    with pytest.raises(NoOptionError):
+        document.get("main", "missing")
+
+
+def test_options_without_section():
+    document = ConfigFormatter().parse("key = value\n[section]\nother = value\n")
+    assert document.sections() == ["section"]
+    assert document.options(None) == ["key"]
+    assert document.get(None, "key") == "value"
+
+
+@pytest.mark.parametrize("config", ["", "\n\n", "  \n"])
+def test_empty(config: str):
+    document = ConfigFormatter().parse(config)
+    assert [(block.kind, block.text) for block in document] == [("space", "\n")]
+    assert document.render() == "\n"
+
+
+def test_blocks_are_compact():
+    block = ConfigFormatter().parse("[section]\n").blocks[0]
+    assert not hasattr(block, "__dict__")
+    with pytest.raises(AttributeError):
+        block.parent = None
+
+
+def test_pickle():
+    document = ConfigFormatter().parse(CONFIG)
+    copy = pickle.loads(pickle.dumps(document))
+    assert repr(copy.blocks) == repr(document.blocks)
+
+
+def test_repr():
+    block = ConfigBlock("option", 1, 1, "section", "key", "key = value\n")
+    assert repr(block) == "ConfigBlock('option', 1, 1, 'section', 'key', 'key = value\\n')"
@@ -0,0 +1,130 @@
+import concurrent.futures
+import functools
+import pickle
+import random
+from configparser import DuplicateOptionError, ParsingError
+
+import configupdater.parser
+import pytest
+
+from config_formatter import ENGINES, ConfigFormatter
+
+# Edge cases of the parsing rules, on which the engines must agree.
+EDGE_CASE_FRAGMENTS = [
+    "  [indented]  # Comment.",
+    "[[nested]] ;comment",
+    "[ ]",
+    "[]",
+    "[config-formatter-dummy-section-name-1]",
+    "key5 :: value5",
+    "k\x1c=\x1cv",
+    " = value",
+    "invalid",
+    "      deeper continuation",
+    "\tcontinuation",
+    "a\x0cb",
+    "value\r",
+    "\xa0value",
+    "  # key = value",
+    "\t",
+    "\r",
+    "\x0c",
+    "\x1c",
+]
+
+
+def run(formatter: ConfigFormatter, config: str):
+    try:
+        return formatter.prettify(config)
+    except Exception as error:
+        return type(error)
+
+
+def test_invalid_engine():
+    with pytest.raises(ValueError, match="Invalid engine"):
+        ConfigFormatter(engine="foobar")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_property(engine: str):
+    assert ConfigFormatter(engine=engine).engine == engine
+
+
+def test_native_engine_is_default():
+    assert ConfigFormatter().engine == "native"
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_engines_produce_identical_output(generate_config, seed: int):
+    rng = random.Random(seed)
+    native = ConfigFormatter(engine="native")
+    reference = ConfigFormatter(engine="configupdater")
+    for _ in range(500):
+        config = generate_config(rng, extra=EDGE_CASE_FRAGMENTS)
+        assert run(native, config) == run(reference, config), config
+
+
+def test_native_engine_parsing_error_line_numbers():
+    config = "[section]\nkey = value\ninvalid\nother = value\n  # Comment\nwrong"
+    with pytest.raises(ParsingError) as excinfo:
+        ConfigFormatter(engine="native").prettify(config)
+    assert [lineno for lineno, _ in excinfo.value.errors] == [3, 6]
+
+
+def test_native_engine_duplicate_option_without_top_section():
+    with pytest.raises(DuplicateOptionError):
+        ConfigFormatter(engine="native").prettify("key = 1\nkey = 2\n[section]\nkey = 3")
+
+
+@pytest.mark.parametrize("config", ["key = value\n[section]", "[section]\nkey = value", "# Only."])
+def test_configupdater_engine_parses_once(monkeypatch, config: str):
+    calls = []
+    original_read = configupdater.parser.Parser._read
+
+    def read(self, *args, **kwargs):
+        calls.append(args)
+        return original_read(self, *args, **kwargs)
+
+    monkeypatch.setattr(configupdater.parser.Parser, "_read", read)
+    ConfigFormatter(engine="configupdater").prettify(config)
+    assert len(calls) == 1
+
+
+def test_configupdater_parser_created_for_each_configuration(monkeypatch):
+    parsers = []
+    original_init = configupdater.parser.Parser.__init__
+
+    def init(self, *args, **kwargs):
+        parsers.append(self)
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(configupdater.parser.Parser, "__init__", init)
+    formatter = ConfigFormatter(engine="configupdater")
+    assert formatter.prettify("[a]\nkey=1\n") == "[a]\nkey = 1\n"
+    assert formatter.prettify("[b]\nkey=2\n") == "[b]\nkey = 2\n"
+    with pytest.raises(DuplicateOptionError):
+        formatter.prettify("[a]\nkey=1\nkey=2\n")
+    assert formatter.prettify("[a]\nkey=1\n[b]\nkey=2\n") == "[a]\nkey = 1\n[b]\nkey = 2\n"
+    assert len(set(map(id, parsers))) == len(parsers) == 4
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_formatter_shared_between_threads(generate_config, engine: str):
+    rng = random.Random(0)
+    formatter = ConfigFormatter(engine=engine)
+    configs = [generate_config(rng, extra=EDGE_CASE_FRAGMENTS) for _ in range(200)]
+    expected = [run(formatter, config) for config in configs]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(functools.partial(run, formatter), configs))
+
+    assert results == expected
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_formatter_can_be_pickled_after_use(engine: str):
+    formatter = ConfigFormatter(engine=engine)
+    formatter.prettify("[section]\nkey=value\n")
+    copy = pickle.loads(pickle.dumps(formatter))
+    assert copy.engine == engine
+    assert copy.prettify("[section]\nkey=value\n") == "[section]\nkey = value\n"
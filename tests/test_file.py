@@ -0,0 +1,121 @@
+import codecs
+import os
+from configparser import DuplicateOptionError
+
+import pytest
+
+from config_formatter import ENGINES, ConfigFormatter, VerificationError
+
+UNFORMATTED = "[section]\nkey=value\nlist=\n a\n b\n"
+FORMATTED = "[section]\nkey = value\nlist =\n    a\n    b\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_format_in_place(tmp_path, engine: str):
+    path = tmp_path / "config.ini"
+    path.write_bytes(UNFORMATTED.encode("utf-8"))
+    assert ConfigFormatter(engine=engine).prettify_file(str(path)) is True
+    assert path.read_bytes() == FORMATTED.encode("utf-8")
+    assert os.listdir(str(tmp_path)) == ["config.ini"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_format_to_target(tmp_path, engine: str):
+    path, target = tmp_path / "config.ini", tmp_path / "formatted.ini"
+    path.write_bytes(UNFORMATTED.encode("utf-8"))
+    assert ConfigFormatter(engine=engine).prettify_file(str(path), str(target)) is True
+    assert path.read_bytes() == UNFORMATTED.encode("utf-8")
+    assert target.read_bytes() == FORMATTED.encode("utf-8")
+
+
+def test_formatted_file_is_not_rewritten(tmp_path):
+    path = tmp_path / "config.ini"
+    path.write_bytes(FORMATTED.encode("utf-8"))
+    os.utime(str(path), (0, 0))
+    assert ConfigFormatter().prettify_file(str(path)) is False
+    assert path.stat().st_mtime == 0
+    assert os.listdir(str(tmp_path)) == ["config.ini"]
+
+
+def test_formatted_file_is_copied_to_target(tmp_path):
+    path, target = tmp_path / "config.ini", tmp_path / "formatted.ini"
+    path.write_bytes(FORMATTED.encode("utf-8"))
+    assert ConfigFormatter().prettify_file(str(path), str(target)) is False
+    assert target.read_bytes() == FORMATTED.encode("utf-8")
+
+
+@pytest.mark.parametrize(
+    "content, formatted",
+    [
+        ("", "\n"),
+        ("\n", "\n"),
+        ("[section]\nkey = value", "[section]\nkey = value\n"),
+        ("[section]\nkey = value\n\n\n", "[section]\nkey = value\n"),
+    ],
+)
+def test_whole_content_is_compared(tmp_path, content: str, formatted: str):
+    path = tmp_path / "config.ini"
+    path.write_bytes(content.encode("utf-8"))
+    changed = ConfigFormatter().prettify_file(str(path))
+    assert path.read_bytes() == formatted.encode("utf-8")
+    assert changed is (content != formatted)
+
+
+def test_newlines_are_normalized(tmp_path):
+    path, target = tmp_path / "config.ini", tmp_path / "formatted.ini"
+    path.write_bytes(b"[section]\r\nkey=value\r[other]\r\nkey = value\r\n")
+    assert ConfigFormatter().prettify_file(str(path), str(target)) is True
+    assert target.read_bytes() == b"[section]\nkey = value\n[other]\nkey = value\n"
+
+
+def test_file_differing_only_by_newlines_is_not_rewritten(tmp_path):
+    path = tmp_path / "config.ini"
+    path.write_bytes(b"[section]\r\nkey = value\r\n")
+    assert ConfigFormatter().prettify_file(str(path)) is False
+    assert path.read_bytes() == b"[section]\r\nkey = value\r\n"
+
+
+@pytest.mark.parametrize(
+    "mark, encoding",
+    [
+        (b"", "utf-8"),
+        (codecs.BOM_UTF8, "utf-8"),
+        (codecs.BOM_UTF16_LE, "utf-16-le"),
+        (codecs.BOM_UTF16_BE, "utf-16-be"),
+        (codecs.BOM_UTF32_LE, "utf-32-le"),
+        (codecs.BOM_UTF32_BE, "utf-32-be"),
+    ],
+)
+def test_encoding_is_preserved(tmp_path, mark: bytes, encoding: str):
+    path = tmp_path / "config.ini"
+    path.write_bytes(mark + "[séction]\nkey=välue\n".encode(encoding))
+    assert ConfigFormatter().prettify_file(str(path)) is True
+    assert path.read_bytes() == mark + "[séction]\nkey = välue\n".encode(encoding)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_invalid_file_is_left_untouched(tmp_path, engine: str):
+    path = tmp_path / "config.ini"
+    path.write_bytes(b"[section]\nkey = 1\nkey = 2\n")
+    with pytest.raises(DuplicateOptionError):
+        ConfigFormatter(engine=engine).prettify_file(str(path))
+    assert path.read_bytes() == b"[section]\nkey = 1\nkey = 2\n"
+    assert os.listdir(str(tmp_path)) == ["config.ini"]
+
+
+def test_undecodable_file_is_left_untouched(tmp_path):
+    path = tmp_path / "config.ini"
+    path.write_bytes(b"[section]\nkey = \xff\n")
+    with pytest.raises(UnicodeDecodeError):
+        ConfigFormatter().prettify_file(str(path))
+    assert path.read_bytes() == b"[section]\nkey = \xff\n"
+    assert os.listdir(str(tmp_path)) == ["config.ini"]
+
+
+def test_verified_file(tmp_path):
+    path = tmp_path / "config.ini"
+    content = b"[section]\nkey = value\n\n# Comment.\n\n  continuation\n"
+    path.write_bytes(content)
+    with pytest.raises(VerificationError):
+        ConfigFormatter(verify=True).prettify_file(str(path))
+    assert path.read_bytes() == content
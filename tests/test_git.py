@@ -0,0 +1,154 @@
+import shutil
+import subprocess
+
+import pytest
+
+from config_formatter_cli import main
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+UNFORMATTED = "[section]\nkey=value\n"
+FORMATTED = "[section]\nkey = value\n"
+
+
+def git(repository, *args: str) -> str:
+    command = ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args]
+    process = subprocess.run(command, cwd=str(repository), stdout=subprocess.PIPE, check=True)
+    return process.stdout.decode()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    directory = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("CONFIG_FORMATTER_CACHE_DIR", str(directory))
+    return directory
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    repository = tmp_path / "repository"
+    (repository / "sub").mkdir(parents=True)
+    (repository / "committed.cfg").write_text(UNFORMATTED)
+    (repository / "modified.cfg").write_text(FORMATTED)
+    (repository / "deleted.cfg").write_text(FORMATTED)
+    (repository / "sub" / "modified.ini").write_text(FORMATTED)
+    git(repository, "init", "--quiet")
+    git(repository, "add", ".")
+    git(repository, "commit", "--quiet", "-m", "Initial commit")
+    (repository / "modified.cfg").write_text(UNFORMATTED)
+    (repository / "sub" / "modified.ini").write_text(UNFORMATTED)
+    (repository / "deleted.cfg").unlink()
+    (repository / "untracked.cfg").write_text(UNFORMATTED)
+    (repository / "untracked.txt").write_text(UNFORMATTED)
+    monkeypatch.chdir(str(repository))
+    return repository
+
+
+def test_changed_since(repository, capsys):
+    assert main(["--changed-since", "HEAD"]) == 0
+    assert (repository / "committed.cfg").read_text() == UNFORMATTED
+    assert (repository / "modified.cfg").read_text() == FORMATTED
+    assert (repository / "sub" / "modified.ini").read_text() == FORMATTED
+    assert (repository / "untracked.cfg").read_text() == FORMATTED
+    assert (repository / "untracked.txt").read_text() == UNFORMATTED
+    assert "3 file(s) reformatted, 0 file(s) left unchanged." in capsys.readouterr().err
+
+
+def test_changed_since_committed_changes(repository):
+    git(repository, "commit", "--quiet", "-am", "Second commit")
+    assert main(["--changed-since", "HEAD~1", "--check"]) == 1
+    assert main(["--changed-since", "HEAD"]) == 0
+    assert (repository / "modified.cfg").read_text() == UNFORMATTED
+    assert (repository / "untracked.cfg").read_text() == FORMATTED
+
+
+def test_changed_since_restricted_to_paths(repository):
+    assert main(["--changed-since", "HEAD", "sub", "untracked.txt", "committed.cfg"]) == 0
+    assert (repository / "committed.cfg").read_text() == UNFORMATTED
+    assert (repository / "modified.cfg").read_text() == UNFORMATTED
+    assert (repository / "sub" / "modified.ini").read_text() == FORMATTED
+    assert (repository / "untracked.txt").read_text() == FORMATTED
+
+
+def test_changed_since_from_subdirectory(repository, monkeypatch):
+    monkeypatch.chdir(str(repository / "sub"))
+    assert main(["--changed-since", "HEAD"]) == 0
+    assert (repository / "modified.cfg").read_text() == UNFORMATTED
+    assert (repository / "sub" / "modified.ini").read_text() == FORMATTED
+
+
+def test_changed_since_invalid_ref(repository, capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        main(["--changed-since", "unknown"])
+    assert excinfo.value.code == 2
+    assert "git: " in capsys.readouterr().err
+
+
+def test_not_a_repository(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(str(tmp_path))
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path.parent))
+    with pytest.raises(SystemExit) as excinfo:
+        main(["--staged"])
+    assert excinfo.value.code == 2
+    assert "git: " in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_staged(repository, capsys, jobs: str):
+    git(repository, "add", "modified.cfg", "untracked.txt", "untracked.cfg")
+    assert main(["--staged", "--jobs", jobs]) == 0
+    assert git(repository, "show", ":modified.cfg") == FORMATTED
+    assert (repository / "modified.cfg").read_text() == FORMATTED
+    assert (repository / "sub" / "modified.ini").read_text() == UNFORMATTED
+    assert (repository / "untracked.txt").read_text() == UNFORMATTED
+    assert "2 file(s) reformatted, 0 file(s) left unchanged." in capsys.readouterr().err
+
+
+def test_staged_content_is_read_from_index(repository):
+    git(repository, "add", "modified.cfg", "sub/modified.ini")
+    (repository / "modified.cfg").write_text(FORMATTED)
+    (repository / "sub" / "modified.ini").write_text(FORMATTED)
+    git(repository, "add", "sub/modified.ini")
+    (repository / "sub" / "modified.ini").write_text(UNFORMATTED)
+    assert main(["--staged", "--check"]) == 1
+    assert main(["--staged", "--check", "sub"]) == 0
+
+
+def test_staged_diff(repository, capsys):
+    git(repository, "add", "modified.cfg")
+    (repository / "modified.cfg").write_text(FORMATTED)
+    assert main(["--staged", "--diff"]) == 0
+    assert "+key = value\n" in capsys.readouterr().out
+    assert git(repository, "show", ":modified.cfg") == UNFORMATTED
+
+
+def test_staged_byte_order_mark_preserved(repository):
+    (repository / "modified.cfg").write_bytes(UNFORMATTED.encode("utf-16"))
+    git(repository, "add", "modified.cfg")
+    assert main(["--staged"]) == 0
+    assert (repository / "modified.cfg").read_bytes() == FORMATTED.encode("utf-16")
+    assert git(repository, "diff", "modified.cfg") == ""  # The working tree matches the index.
+
+
+def test_staged_with_unstaged_changes(repository, capsys):
+    git(repository, "add", "modified.cfg")
+    (repository / "modified.cfg").write_text(UNFORMATTED + "other=1\n")
+    assert main(["--staged"]) == 1
+    assert "has unstaged changes" in capsys.readouterr().err
+    assert git(repository, "show", ":modified.cfg") == UNFORMATTED
+    assert (repository / "modified.cfg").read_text() == UNFORMATTED + "other=1\n"
+
+
+def test_staged_ignores_deleted_files(repository, capsys):
+    git(repository, "add", "--all")
+    assert main(["--staged", "--check"]) == 1
+    assert "3 file(s) would be reformatted" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    "args", [["--staged", "--changed-since", "HEAD"], ["--staged", "--watch", "."]]
+)
+def test_incompatible_options(repository, args):
+    with pytest.raises(SystemExit) as excinfo:
+        main(args)
+    assert excinfo.value.code == 2
@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+from typing import Set
+
+import pytest
+
+# Importing the module must stay fast as the command-line tool is invoked frequently (e.g. by
+# pre-commit hooks), hence heavy dependencies are only imported once they're actually needed.
+LAZY_MODULES = [
+    "asyncio",
+    "configupdater",
+    "concurrent.futures",
+    "ctypes",
+    "difflib",
+    "multiprocessing",
+    "socket",
+    "subprocess",
+    "tempfile",
+]
+
+
+@pytest.fixture
+def imported_modules():
+    """Run the code in a fresh interpreter and return the modules it imported."""
+
+    def run(code: str) -> Set[str]:
+        code += "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))\n"
+        command = [sys.executable, "-c", code]
+        process = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+        return set(json.loads(process.stdout.decode().splitlines()[-1]))
+
+    return run
+
+
+@pytest.mark.parametrize("module", ["config_formatter", "config_formatter_cli"])
+def test_heavy_modules_are_not_imported(imported_modules, module: str):
+    modules = imported_modules(f"import {module}")
+    assert module in modules
+    assert not set(LAZY_MODULES) & modules
+
+
+def test_command_line_interface_is_not_imported(imported_modules):
+    modules = imported_modules("import config_formatter")
+    assert "argparse" not in modules
+    assert "config_formatter_cli" not in modules
+
+
+@pytest.mark.parametrize("engine", ["native", "configupdater"])
+def test_heavy_modules_are_imported_when_needed(imported_modules, engine: str):
+    code = (
+        "import config_formatter\n"
+        f"config_formatter.ConfigFormatter(engine='{engine}').prettify('[section]\\nkey=value')\n"
+        "assert config_formatter.ConfigFormatter().prettify('key=value') == 'key = value\\n'\n"
+    )
+    modules = imported_modules(code)
+    assert ("configupdater" in modules) is (engine == "configupdater")
@@ -0,0 +1,121 @@
+import random
+from configparser import DuplicateSectionError, Error, ParsingError
+from typing import List
+
+import pytest
+
+from config_formatter import ConfigFormatter, TextEdit
+
+
+def apply_edits(text: str, edits: List[TextEdit]) -> str:
+    output, position = [], 0
+    for start, end, replacement in edits:
+        assert start >= position
+        output += [text[position:start], replacement]
+        position = end
+    output.append(text[position:])
+    return "".join(output)
+
+
+def test_edit_inside_section():
+    source = "[a]\nkey=1\n\n[b]\nkey=2\nlist=\n x\n y\n\n[c]\nkey=3\n"
+    formatter = ConfigFormatter()
+    formatted = formatter.prettify(source)
+    start = source.index(" y")
+    new_formatted, edits = formatter.prettify_incremental(
+        source, formatted, TextEdit(start, start + 2, " y\n z")
+    )
+    expected = "[a]\nkey = 1\n\n[b]\nkey = 2\nlist =\n    x\n    y\n    z\n\n[c]\nkey = 3\n"
+    assert new_formatted == expected
+    position = formatted.index("    y\n") + len("    y\n")
+    assert edits == [TextEdit(position, position, "    z\n")]
+
+
+def test_only_affected_sections_are_formatted(monkeypatch):
+    source = "".join(f"[section{i}]\nkey={i}\n\n" for i in range(1000))
+    formatter = ConfigFormatter()
+    formatted = formatter.prettify(source)
+
+    lines = []
+    original_iter_native = ConfigFormatter._iter_native
+
+    def iter_native(self, region_lines, *args):
+        region_lines = list(region_lines)
+        lines.extend(region_lines)
+        return original_iter_native(self, region_lines, *args)
+
+    monkeypatch.setattr(ConfigFormatter, "_iter_native", iter_native)
+    start = source.index("key=500")
+    new_formatted, edits = formatter.prettify_incremental(
+        source, formatted, TextEdit(start, start + 7, "key = 1000")
+    )
+    assert lines == ["[section500]", "key = 1000", ""]
+    assert new_formatted == formatted.replace("key = 500\n", "key = 1000\n")
+    assert len(edits) == 1
+
+
+def test_edit_introducing_duplicate_section():
+    source = "[a]\nkey=1\n[b]\nkey=2\n[c]\nkey=3\n"
+    formatter = ConfigFormatter()
+    formatted = formatter.prettify(source)
+    start = source.index("key=2")
+    with pytest.raises(DuplicateSectionError):
+        formatter.prettify_incremental(source, formatted, TextEdit(start, start, "[a]\n"))
+
+
+def test_edit_introducing_duplicate_section_before_duplicate_option():
+    source = "  [s2]\n[S]\nk:v\n  \n    # ind\n[s]\n# c\n; c\n# c\nx =\n"
+    formatter = ConfigFormatter()
+    formatted = formatter.prettify(source)
+    with pytest.raises(DuplicateSectionError):
+        formatter.prettify_incremental(source, formatted, TextEdit(36, 40, "[S]\nKey = x\nKey = x"))
+
+
+def test_edit_introducing_parsing_error():
+    source = "[a]\nkey=1\n[b]\nkey=2\n[c]\nkey=3\n"
+    formatter = ConfigFormatter()
+    formatted = formatter.prettify(source)
+    start = source.index("key=2")
+    with pytest.raises(ParsingError) as excinfo:
+        formatter.prettify_incremental(source, formatted, TextEdit(start, start + 5, "invalid"))
+    assert [lineno for lineno, _ in excinfo.value.errors] == [4]
+
+
+@pytest.mark.parametrize("start, end", [(-1, 0), (0, 100), (5, 4)])
+def test_invalid_edit_range(start: int, end: int):
+    with pytest.raises(ValueError, match="Invalid edit range"):
+        ConfigFormatter().prettify_incremental(
+            "[a]\nk=v\n", "[a]\nk = v\n", TextEdit(start, end, "x")
+        )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_consistent_with_prettify(generate_config, seed: int):
+    rng = random.Random(seed)
+    formatter = ConfigFormatter()
+    replacements = ["", "\n", "[z]\n", "[a]\n", "k3 = v\n", "  x", "\n\n[b]", "# c\n", "q"]
+    replacements += ["[b]\nk = v\nk = v\n", "k = v\nk = v\n[a]\n"]
+
+    for _ in range(1000):
+        source = generate_config(rng, max_lines=20, endings=["", "\n", "\n \n"])
+        try:
+            formatted = formatter.prettify(source)
+        except Error:
+            continue
+
+        start = rng.randint(0, len(source))
+        end = rng.randint(start, min(len(source), start + 15))
+        edit = TextEdit(start, end, rng.choice(replacements))
+        new_source = source[:start] + edit.text + source[end:]
+
+        try:
+            expected = formatter.prettify(new_source)
+        except Error as error:
+            with pytest.raises(Error) as excinfo:
+                formatter.prettify_incremental(source, formatted, edit)
+            assert type(excinfo.value) is type(error), (source, edit)
+            continue
+
+        new_formatted, edits = formatter.prettify_incremental(source, formatted, edit)
+        assert new_formatted == expected, (source, edit)
+        assert apply_edits(formatted, edits) == expected
@@ -0,0 +1,82 @@
+from configparser import DuplicateSectionError, ParsingError
+
+import pytest
+
+from config_formatter import ConfigFormatter, FormattingCache
+
+CONFIGS = [
+    "[section]\nkey=value\n",
+    "[section]\ninvalid\n",
+    "",
+    "key = value\n",
+    "[a]\n[a]\n",
+    "[section]\nlist=\n a\n b\n",
+]
+EXPECTED = [
+    "[section]\nkey = value\n",
+    ParsingError,
+    "\n",
+    "key = value\n",
+    DuplicateSectionError,
+    "[section]\nlist =\n    a\n    b\n",
+]
+
+
+def normalize(results):
+    return [result if isinstance(result, str) else type(result) for result in results]
+
+
+@pytest.mark.parametrize("engine", ["native", "configupdater"])
+@pytest.mark.parametrize("workers", [None, 1, 2])
+def test_prettify_many(engine: str, workers):
+    results = ConfigFormatter(engine=engine).prettify_many(CONFIGS, workers=workers)
+    assert normalize(results) == EXPECTED
+
+
+# Invalid configuration on which "configupdater" fails with an unexpected exception.
+CONFIGUPDATER_FAILURE = "# c\nx =\n\n# c\n    # ind comment\n\t\n  \n  k2=v"
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_prettify_many_unexpected_error(workers):
+    formatter = ConfigFormatter(engine="configupdater")
+    results = formatter.prettify_many(
+        [CONFIGS[0], CONFIGUPDATER_FAILURE, CONFIGS[0]], workers=workers
+    )
+    assert isinstance(results[1], Exception)
+    assert results[0] == results[2] == "[section]\nkey = value\n"
+
+
+def test_prettify_many_consumes_any_iterable():
+    results = ConfigFormatter().prettify_many(config for config in CONFIGS)
+    assert normalize(results) == EXPECTED
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_prettify_many_empty(workers):
+    assert ConfigFormatter().prettify_many([], workers=workers) == []
+
+
+@pytest.mark.parametrize("workers", [0, -1])
+def test_prettify_many_invalid_workers(workers: int):
+    with pytest.raises(ValueError, match="Invalid number of workers"):
+        ConfigFormatter().prettify_many(CONFIGS, workers=workers)
+
+
+def test_prettify_many_with_workers_preserves_order():
+    configs = [f"[section{i}]\nkey={i}\n" for i in range(200)]
+    results = ConfigFormatter().prettify_many(configs, workers=3)
+    assert results == [f"[section{i}]\nkey = {i}\n" for i in range(200)]
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_prettify_many_updates_cache(tmp_path, workers):
+    cache = FormattingCache(str(tmp_path / "cache.txt"))
+    formatter = ConfigFormatter(cache=cache)
+    formatted = [f"[section{i}]\nkey = {i}\n" for i in range(10)]
+    assert formatter.prettify_many(formatted + ["key=value"], workers=workers) == formatted + [
+        "key = value\n"
+    ]
+    assert len(cache) == 10
+    assert formatter.prettify_many(formatted, workers=workers) == formatted
+    assert len(cache) == 10
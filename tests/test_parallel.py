@@ -0,0 +1,162 @@
+import concurrent.futures
+import multiprocessing
+import random
+import threading
+from configparser import DuplicateOptionError, DuplicateSectionError, ParsingError
+
+import pytest
+
+import config_formatter
+import config_formatter_cli
+from config_formatter import ENGINES, ConfigFormatter
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    """Record the chunks formatted in parallel, formatting them in the current process."""
+    chunks = []
+
+    def run_jobs(function, items, *, jobs):
+        chunks.extend(items)
+        return [function(item) for item in items]
+
+    monkeypatch.setattr(config_formatter, "run_jobs", run_jobs)
+    return chunks
+
+
+def run(formatter: ConfigFormatter, config: str):
+    try:
+        return formatter.prettify(config)
+    except Exception as error:
+        return type(error), str(error)
+
+
+def parallel(engine: str = "native", **kwargs) -> ConfigFormatter:
+    kwargs.setdefault("parallel_threshold", 0)
+    kwargs.setdefault("parallel_workers", 4)
+    return ConfigFormatter(engine=engine, **kwargs)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("seed", range(5))
+def test_parallel_output_identical(jobs, generate_config, engine: str, seed: int):
+    rng = random.Random(seed)
+    serial = ConfigFormatter(engine=engine, parallel_threshold=None)
+    formatter = parallel(engine)
+    for _ in range(50):
+        config = generate_config(rng, max_lines=200, unique=True, valid=True)
+        assert run(formatter, config) == run(serial, config), config
+    assert len(jobs) > 50
+
+
+def test_parallel_chunks_start_at_non_indented_headers(jobs):
+    config = "[a]\nkey = 1\n  [b]\n  x\n[c]\nkey = 2\n\n[d]\nkey = 3\n"
+    expected = "[a]\nkey = 1\n      [b]\n      x\n[c]\nkey = 2\n\n[d]\nkey = 3\n"
+    assert parallel().prettify(config) == expected
+    assert jobs == [("[a]\nkey = 1\n  [b]\n  x", 1), ("[c]\nkey = 2\n", 5), ("[d]\nkey = 3", 8)]
+
+
+def test_parallel_with_process_pool():
+    config = "".join(f"[section{i}]\nkey=value\nlist=\n  a\n  b\n\n" for i in range(100))
+    expected = ConfigFormatter(parallel_threshold=None).prettify(config)
+    assert parallel(parallel_workers=2).prettify(config) == expected
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize(
+    "config, exception, lineno",
+    [
+        ("[a]\nkey = 1\n[b]\nkey = 2\n[a]\nkey = 3\n", DuplicateSectionError, 5),
+        ("[a]\nkey = 1\n[b]\nkey = 2\nkey = 3\n[c]\n", DuplicateOptionError, 5),
+        ("[a]\ninvalid\n[b]\nkey = 2\n[c]\nwrong\n", ParsingError, 2),
+    ],
+)
+def test_parallel_errors_identical(jobs, engine: str, config: str, exception: type, lineno: int):
+    with pytest.raises(exception) as excinfo:
+        ConfigFormatter(engine=engine, parallel_threshold=None).prettify(config)
+    with pytest.raises(exception) as parallel_excinfo:
+        parallel(engine).prettify(config)
+    assert str(parallel_excinfo.value) == str(excinfo.value)
+    assert len(jobs) > 1
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"parallel_threshold": 1000},
+        {"parallel_threshold": None},
+        {"parallel_workers": 1},
+        {"verify": True},
+        {"stats": config_formatter.FormattingStats()},
+    ],
+)
+def test_parallel_disabled(jobs, kwargs: dict):
+    config = "[a]\nkey=1\n[b]\nkey=2\n[c]\nkey=3\n"
+    assert parallel(**kwargs).prettify(config) == "[a]\nkey = 1\n[b]\nkey = 2\n[c]\nkey = 3\n"
+    assert jobs == []
+
+
+def test_parallel_disabled_in_daemonic_process(jobs, monkeypatch):
+    monkeypatch.setattr(multiprocessing.current_process(), "daemon", True)
+    assert parallel().prettify("[a]\nkey=1\n[b]\nkey=2\n") == "[a]\nkey = 1\n[b]\nkey = 2\n"
+    assert jobs == []
+
+
+def test_parallel_single_chunk(jobs):
+    assert parallel().prettify("[a]\n  key=1\n  [b]\n") == "[a]\nkey = 1\n[b]\n"
+    assert jobs == []
+
+
+def test_parallel_disabled_by_default(jobs):
+    config = "[a]\nkey=1\n[b]\nkey=2\n"
+    assert ConfigFormatter(parallel_workers=4).prettify(config) == "[a]\nkey = 1\n[b]\nkey = 2\n"
+    assert jobs == []
+
+
+def test_parallel_disabled_outside_main_thread(jobs):
+    formatter = parallel()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        result = executor.submit(formatter.prettify, "[a]\nkey=1\n[b]\nkey=2\n").result()
+    assert result == "[a]\nkey = 1\n[b]\nkey = 2\n"
+    assert jobs == []
+
+
+def test_parallel_disabled_while_other_threads_run(jobs):
+    formatter = parallel()
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        assert formatter.prettify("[a]\nkey=1\n[b]\nkey=2\n") == "[a]\nkey = 1\n[b]\nkey = 2\n"
+    finally:
+        stop.set()
+        thread.join()
+    assert jobs == []
+    assert formatter.prettify("[a]\nkey=1\n[b]\nkey=2\n") == "[a]\nkey = 1\n[b]\nkey = 2\n"
+    assert jobs != []
+
+
+def test_parallel_used_by_command_line(tmp_path, monkeypatch):
+    thresholds = []
+    original_init = ConfigFormatter.__init__
+
+    def init(self, **kwargs):
+        thresholds.append(kwargs.get("parallel_threshold"))
+        original_init(self, **kwargs)
+
+    monkeypatch.setattr(ConfigFormatter, "__init__", init)
+    (tmp_path / "setup.cfg").write_text("[a]\nkey=1\n")
+    assert config_formatter_cli.main(["--no-cache", str(tmp_path / "setup.cfg")]) == 0
+    assert thresholds[0] == config_formatter.DEFAULT_PARALLEL_THRESHOLD
+
+
+@pytest.mark.parametrize("threshold", [-1, -100])
+def test_invalid_parallel_threshold(threshold: int):
+    with pytest.raises(ValueError, match="Invalid parallel threshold"):
+        ConfigFormatter(parallel_threshold=threshold)
+
+
+@pytest.mark.parametrize("workers", [0, -1])
+def test_invalid_parallel_workers(workers: int):
+    with pytest.raises(ValueError, match="Invalid number of workers"):
+        ConfigFormatter(parallel_workers=workers)
@@ -1,18 +1,20 @@
+import io
 from configparser import ConfigParser, DuplicateSectionError
 from textwrap import dedent
 
 import pytest
 
-from config_formatter import ConfigFormatter
+from config_formatter import ENGINES, ConfigFormatter
 
 
 def compare_formatting(config: str, expected: str, *, verify_parsing: bool = True) -> None:
     config = dedent(config)
     expected = dedent(expected)
 
-    formatter = ConfigFormatter()
-    result = formatter.prettify(config)
-    assert result == expected
+    for engine in ENGINES:
+        formatter = ConfigFormatter(engine=engine)
+        result = formatter.prettify(config)
+        assert result == expected
 
     if verify_parsing:
         parser_before, parser_after = ConfigParser(), ConfigParser()
@@ -675,7 +677,24 @@ def test_no_error_if_dummy_section_name_exists_without_top_section():
     compare_formatting(config, expected, verify_parsing=False)
 
 
-def test_duplicate_section_error_reported_when_no_top_section():
+@pytest.mark.parametrize("count", [1, 10, 500])
+def test_no_error_if_many_dummy_section_names_exist_without_top_section(count: int):
+    *names, last = [f"config-formatter-dummy-section-name-{i}" for i in range(count + 1)]
+    config = f"root:true\n# [{last}]\n" + "".join(f"[{name}]\nk:v\n" for name in names)
+    expected = f"root = true\n# [{last}]\n" + "".join(f"[{n}]\nk = v\n" for n in names)
+    compare_formatting(config, expected, verify_parsing=False)
+
+
+def test_dummy_section_name_skips_all_existing_ones():
+    config = "".join(f"[config-formatter-dummy-section-name-{i}]\n" for i in range(300, 0, -1))
+    config += "[config-formatter-dummy-section-name-302]\n"
+    config += "[config-formatter-dummy-section-name-0301]\n"
+    dummy_section = ConfigFormatter()._find_dummy_section(config)
+    assert dummy_section == "[config-formatter-dummy-section-name-301]"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_duplicate_section_error_reported_when_no_top_section(engine: str):
     config = """\
     key1 = value1
 
@@ -686,7 +705,7 @@ def test_duplicate_section_error_reported_when_no_top_section():
     key = value
     """
     with pytest.raises(DuplicateSectionError):
-        ConfigFormatter().prettify(dedent(config))
+        ConfigFormatter(engine=engine).prettify(dedent(config))
 
 
 def test_testenv_example():
@@ -873,3 +892,38 @@ def test_configparser_example():
     # Did I mention we can indent comments, too?
     """
     compare_formatting(config, expected)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("string", ["", " \n", "[section]\nkey=value", "key :\n  a\n\n  b\n[s]#c"])
+def test_prettify_to_stream(engine: str, string: str):
+    formatter = ConfigFormatter(engine=engine)
+    stream = io.StringIO()
+    formatter.prettify_to(string, stream)
+    assert stream.getvalue() == formatter.prettify(string)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_prettify_to_stream_does_not_close_it(engine: str):
+    stream = io.StringIO()
+    stream.write("# Header.\n")
+    ConfigFormatter(engine=engine).prettify_to("[section]", stream)
+    stream.write("# Footer.\n")
+    assert stream.getvalue() == "# Header.\n[section]\n# Footer.\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_prettify_many_sections(engine: str):
+    config = "".join(f"[section{i}]\nkey{i}={i}\nlist=\n a\n  b\n\n" for i in range(2000))
+    expected = "".join(f"[section{i}]\nkey{i} = {i}\nlist =\n    a\n    b\n\n" for i in range(2000))
+    assert ConfigFormatter(engine=engine).prettify(config) == expected[:-1]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_prettify_long_multiline_values(engine: str):
+    items = "".join(f"  item{i}  \n\n" for i in range(5000))
+    config = f"[section]\nlist =\n{items}key = first\n{items}"
+    items = "".join(f"{' ' * 4}item{i}\n\n" for i in range(5000))
+    aligned = "".join(f"{' ' * 6}item{i}\n\n" for i in range(5000))
+    expected = f"[section]\nlist =\n{items}key = first\n{aligned}"
+    assert ConfigFormatter(engine=engine).prettify(config) == expected[:-1]
@@ -0,0 +1,123 @@
+import random
+from configparser import DuplicateOptionError, ParsingError
+
+import pytest
+
+from config_formatter import ConfigFormatter
+
+SOURCE = (
+    "[first]\n"
+    "key=1\n"
+    "\n"
+    "\n"
+    "[second]\n"
+    "key=2\n"
+    "list=\n"
+    "  x\n"
+    "# comment\n"
+    "  y\n"
+    "other : 3\n"
+    "\n"
+    "[third]   # Comment.\n"
+    "key=3\n"
+)
+
+
+def test_range_within_option():
+    formatted = ConfigFormatter().prettify_range(SOURCE, 10, 10)
+    expected = SOURCE.replace(
+        "list=\n  x\n# comment\n  y\n", "list =\n    x\n    # comment\n    y\n"
+    )
+    assert formatted == expected
+
+
+def test_range_expanded_to_following_blank_lines():
+    formatted = ConfigFormatter().prettify_range(SOURCE, 2, 2)
+    assert formatted == SOURCE.replace("key=1\n\n\n", "key = 1\n\n", 1)
+
+
+def test_range_spanning_sections():
+    formatted = ConfigFormatter().prettify_range(SOURCE, 11, 13)
+    expected = SOURCE.replace(
+        "other : 3\n\n[third]   # Comment.", "other = 3\n\n[third]  # Comment."
+    )
+    assert formatted == expected
+
+
+def test_range_at_end_of_text():
+    source = "[a]\nkey=1\nlist=\n  x\n\n  \n"
+    assert ConfigFormatter().prettify_range(source, 4, 5) == "[a]\nkey=1\nlist =\n    x\n"
+
+
+def test_range_at_start_of_text():
+    source = "\n\n  key=1\n   x\n[a]\nkey=2\n"
+    assert ConfigFormatter().prettify_range(source, 2, 4) == "key = 1\n      x\n[a]\nkey=2\n"
+
+
+def test_whole_text():
+    formatter = ConfigFormatter()
+    assert formatter.prettify_range(SOURCE, 1, 14) == formatter.prettify(SOURCE)
+
+
+def test_blank_text():
+    assert ConfigFormatter().prettify_range("\n \n", 1, 2) == "\n"
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_range_consistent_with_prettify(generate_config, seed: int):
+    rng = random.Random(seed)
+    formatter = ConfigFormatter()
+    for _ in range(200):
+        source = generate_config(rng, max_lines=30, unique=True) + "\n"
+        try:
+            expected = formatter.prettify(source)
+        except (DuplicateOptionError, ParsingError):
+            continue
+        line_count = source.count("\n")
+        assert formatter.prettify_range(source, 1, line_count) == expected
+        start = rng.randint(1, line_count)
+        end = rng.randint(start, line_count)
+        formatted = formatter.prettify_range(source, start, end)
+        if formatter.prettify(expected) == expected:  # Unless the formatting isn't idempotent.
+            assert formatter.prettify(formatted) == expected
+
+
+def test_only_expanded_range_is_formatted(monkeypatch):
+    source = "".join(f"[section{i}]\nkey={i}\nlist =\n  a\n\n" for i in range(1000))
+    formatter = ConfigFormatter()
+
+    lines = []
+    original_iter_native = ConfigFormatter._iter_native
+
+    def iter_native(self, range_lines, *args):
+        range_lines = list(range_lines)
+        lines.extend(range_lines)
+        return original_iter_native(self, range_lines, *args)
+
+    monkeypatch.setattr(ConfigFormatter, "_iter_native", iter_native)
+    formatted = formatter.prettify_range(source, 2504, 2504)
+    assert lines == ["list =", "  a", ""]
+    assert formatted == source.replace(
+        "[section500]\nkey=500\nlist =\n  a\n", "[section500]\nkey=500\nlist =\n    a\n"
+    )
+
+
+def test_parsing_error_line_numbers():
+    source = "[a]\nkey=1\ninvalid\n[b]\nwrong\n"
+    with pytest.raises(ParsingError) as excinfo:
+        ConfigFormatter().prettify_range(source, 2, 3)
+    assert [lineno for lineno, _ in excinfo.value.errors] == [3]
+
+
+def test_duplicates_detected_within_range_only():
+    source = "[a]\nkey=1\nkey=2\n[b]\nkey=3\n"
+    formatter = ConfigFormatter()
+    with pytest.raises(DuplicateOptionError):
+        formatter.prettify_range(source, 1, 3)
+    assert formatter.prettify_range(source, 3, 3) == "[a]\nkey=1\nkey = 2\n[b]\nkey=3\n"
+
+
+@pytest.mark.parametrize("start, end", [(0, 1), (2, 1), (1, 4), (4, 4), (-1, 2)])
+def test_invalid_range(start: int, end: int):
+    with pytest.raises(ValueError, match="Invalid line range"):
+        ConfigFormatter().prettify_range("[a]\nkey=1\n\n", start, end)
@@ -0,0 +1,125 @@
+import json
+import pickle
+from configparser import ParsingError
+
+import pytest
+
+from config_formatter import ENGINES, ConfigFormatter, FormattingStats
+
+CONFIG = "# Header.\n\n[section]  # Comment.\nkey=value\nlist =\n  a\n  b\n\n# Footer.\n; Other.\n"
+SECTIONLESS = "key = value\n[section]\nother = value\n"
+PHASES = {"native": {"strip", "tokenize"}, "configupdater": {"strip", "parse", "format"}}
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_stats(engine: str):
+    stats = FormattingStats()
+    formatter = ConfigFormatter(engine=engine, stats=stats)
+    assert formatter.stats is stats
+    assert formatter.prettify(CONFIG) == ConfigFormatter(engine=engine).prettify(CONFIG)
+
+    assert stats.configurations == 1
+    assert stats.characters == len(CONFIG)
+    assert stats.fallbacks == 0
+    assert stats.blocks == {"section": 1, "option": 2, "comment": 2, "space": 2}
+    assert set(stats.timings) == PHASES[engine]
+    assert all(duration >= 0 for duration in stats.timings.values())
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_stats_aggregated_over_calls(engine: str):
+    stats = FormattingStats()
+    formatter = ConfigFormatter(engine=engine, stats=stats)
+    formatter.prettify(CONFIG)
+    formatter.prettify(SECTIONLESS)
+    assert formatter.check(CONFIG) == 4
+    formatter.prettify("")
+
+    assert stats.configurations == 4
+    assert stats.characters == 2 * len(CONFIG) + len(SECTIONLESS)
+    assert stats.fallbacks == 1
+    assert stats.blocks == {"section": 3, "option": 6, "comment": 4, "space": 4}
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_invalid_configuration_not_accounted(engine: str):
+    stats = FormattingStats()
+    with pytest.raises(ParsingError):
+        ConfigFormatter(engine=engine, stats=stats).prettify("[section]\ninvalid\n")
+    assert stats.configurations == 0
+
+
+def test_stats_recorded_by_edits_and_diff():
+    stats = FormattingStats()
+    formatter = ConfigFormatter(stats=stats)
+    assert formatter.prettify_edits(CONFIG) == ConfigFormatter().prettify_edits(CONFIG)
+    assert formatter.prettify_diff(SECTIONLESS) == ""
+    assert formatter.prettify_diff("\n") == ""
+    with pytest.raises(ParsingError):
+        formatter.prettify_edits("[section]\ninvalid\n")
+
+    assert stats.configurations == 3
+    assert stats.characters == len(CONFIG) + len(SECTIONLESS) + 1
+    assert stats.fallbacks == 1
+    assert stats.blocks == {"section": 2, "option": 4, "comment": 2, "space": 2}
+    assert set(stats.timings) == PHASES["native"]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_stats_not_recorded_by_streaming(engine: str):
+    stats = FormattingStats()
+    formatter = ConfigFormatter(engine=engine, stats=stats)
+    assert "".join(formatter.iter_prettify(CONFIG.splitlines())) == formatter.prettify(CONFIG)
+    assert stats.configurations == 1
+
+
+def test_stats_shared_between_formatters():
+    stats = FormattingStats()
+    for engine in ENGINES:
+        ConfigFormatter(engine=engine, stats=stats).prettify(CONFIG)
+    assert stats.configurations == 2
+    assert set(stats.timings) == PHASES["native"] | PHASES["configupdater"]
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_stats_recorded_by_prettify_many(workers):
+    stats = FormattingStats()
+    formatter = ConfigFormatter(stats=stats)
+    results = formatter.prettify_many([CONFIG, SECTIONLESS, "[a]\ninvalid\n"], workers=workers)
+    assert isinstance(results[2], ParsingError)
+    assert stats.configurations == 2
+    assert stats.characters == len(CONFIG) + len(SECTIONLESS)
+    assert stats.fallbacks == 1
+
+
+def test_merge():
+    stats, other = FormattingStats(), FormattingStats()
+    ConfigFormatter(stats=stats).prettify(CONFIG)
+    ConfigFormatter(stats=other).prettify(SECTIONLESS)
+    stats.merge(other)
+    assert stats.configurations == 2
+    assert stats.characters == len(CONFIG) + len(SECTIONLESS)
+    assert stats.fallbacks == 1
+    assert stats.blocks["option"] == 4
+
+
+def test_as_dict():
+    stats = FormattingStats()
+    assert stats.as_dict() == {
+        "configurations": 0,
+        "characters": 0,
+        "fallbacks": 0,
+        "blocks": {"section": 0, "option": 0, "comment": 0, "space": 0},
+        "timings": {},
+    }
+    ConfigFormatter(stats=stats).prettify(CONFIG)
+    assert json.loads(json.dumps(stats.as_dict()))["blocks"]["section"] == 1
+
+
+def test_pickle():
+    stats = FormattingStats()
+    ConfigFormatter(stats=stats).prettify(CONFIG)
+    copy = pickle.loads(pickle.dumps(stats))
+    assert copy.as_dict() == stats.as_dict()
+    ConfigFormatter(stats=copy).prettify(CONFIG)
+    assert copy.configurations == 2
@@ -0,0 +1,107 @@
+import io
+from textwrap import dedent
+
+import pytest
+
+from config_formatter import ENGINES, ConfigFormatter
+
+CONFIGS = [
+    "",
+    "\n \n\t\n",
+    "[section]",
+    "\n\n   [section]   \n\n\n",
+    "  key = value\n  other = value\n\n",
+    "\t key =\n      a\n\n\n      b\n\n\n",
+    "# Comment.\r\n\r\n[section]\r\nkey=value\r\n",
+    "[section]\nkey = a\n\x0c\n b\n  \n",
+    dedent(
+        """\
+
+        # Comment before.
+        abc = 123
+            # 456
+            789
+
+        [section-1]
+        foo= bar
+        lists =
+         are
+         indented
+        # including
+         comments
+
+        [section-2]
+        bar =foo
+        """
+    ),
+]
+
+
+class RecordingLines:
+    """Iterate over lines while recording how many of them have been consumed."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.consumed = 0
+
+    def __iter__(self):
+        for line in self.lines:
+            self.consumed += 1
+            yield line
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("config", CONFIGS)
+def test_iter_prettify(engine: str, config: str):
+    formatter = ConfigFormatter(engine=engine)
+    lines = list(io.StringIO(config))
+    assert "".join(formatter.iter_prettify(lines)) == formatter.prettify(config)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("config", CONFIGS)
+def test_iter_prettify_lines_without_newlines(engine: str, config: str):
+    formatter = ConfigFormatter(engine=engine)
+    lines = config.split("\n")
+    assert "".join(formatter.iter_prettify(lines)) == formatter.prettify(config)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("config", CONFIGS)
+def test_prettify_stream(engine: str, config: str):
+    formatter = ConfigFormatter(engine=engine)
+    outfile = io.StringIO()
+    formatter.prettify_stream(io.StringIO(config), outfile)
+    assert outfile.getvalue() == formatter.prettify(config)
+
+
+def test_prettify_stream_with_files(tmp_path):
+    source, destination = tmp_path / "source.cfg", tmp_path / "destination.cfg"
+    source.write_text("[section]\nkey=value\nlist=\n a\n b\n")
+    with source.open() as infile, destination.open("w") as outfile:
+        ConfigFormatter().prettify_stream(infile, outfile)
+    assert destination.read_text() == "[section]\nkey = value\nlist =\n    a\n    b\n"
+
+
+def test_iter_prettify_is_lazy():
+    lines = RecordingLines(["[section]\n", "key=value\n", "  continued\n", "other=value\n"])
+    lines.lines += [f"key{i} = {i}\n" for i in range(1000)]
+    output = ConfigFormatter(engine="native").iter_prettify(lines)
+
+    assert next(output) == "[section]\n"
+    assert lines.consumed == 1
+    assert next(output) == "key = value\n"
+    assert next(output) == "      continued\n"
+    assert lines.consumed == 4
+    assert next(output) == "other = value\n"
+    assert lines.consumed == 5
+
+
+def test_iter_prettify_holds_back_blank_lines_and_comments_after_option():
+    lines = RecordingLines(["[section]\n", "key = 1\n", "\n", "# Comment.\n", "\n", "  2\n", "x=3"])
+    output = ConfigFormatter(engine="native").iter_prettify(lines)
+
+    assert next(output) == "[section]\n"
+    assert next(output) == "key = 1\n"
+    assert lines.consumed == len(lines.lines)
+    assert list(output) == ["\n", "# Comment.\n", "\n", "x = 3\n"]
@@ -0,0 +1,125 @@
+import configparser
+import io
+import random
+from configparser import DuplicateOptionError, ParsingError
+
+import pytest
+
+from config_formatter import ENGINES, ConfigFormatter, FormattingStats, VerificationError
+
+# The blank lines around the comment are not kept in the value, losing the continuation line.
+ALTERED = "[section]\nkey = value\n\n# Comment.\n\n  continuation\n"
+
+CONFIGS = [
+    "",
+    "[section]\nkey=value\n",
+    "# Header.\n\n[section]  # Comment.\nkey=value\nlist =\n  a\n\n  b\n  # c\n\n# Footer.\n",
+    "key = value\n[section]\nother = value\n",
+    "[section]\nmultiline =    text that spans\n on several lines\n      is properly aligned.\n",
+    "[section]\n  key = value\n  # key = other\n   continuation\n",
+]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("config", CONFIGS)
+def test_verified_output_is_unchanged(engine: str, config: str):
+    formatter = ConfigFormatter(engine=engine, verify=True)
+    assert formatter.verify
+    assert formatter.prettify(config) == ConfigFormatter(engine=engine).prettify(config)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_altered_value(engine: str):
+    assert (
+        ConfigFormatter(engine=engine).prettify(ALTERED)
+        == "[section]\nkey = value\n\n# Comment.\n\n"
+    )
+    with pytest.raises(VerificationError, match="expected option 'key' with value 'value\\\\n"):
+        ConfigFormatter(engine=engine, verify=True).prettify(ALTERED)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_altered_options(engine: str):
+    # The first line is stripped, so that the second option becomes a continuation line.
+    config = "  key = value\n  other = value\n"
+    with pytest.raises(VerificationError, match="got option 'key' with value 'value\\\\nother"):
+        ConfigFormatter(engine=engine, verify=True).prettify(config)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_verify_streamed_lines(engine: str):
+    formatter = ConfigFormatter(engine=engine, verify=True)
+    for config in CONFIGS:
+        assert "".join(formatter.iter_prettify(io.StringIO(config))) == formatter.prettify(config)
+    with pytest.raises(VerificationError):
+        list(formatter.iter_prettify(io.StringIO(ALTERED)))
+
+
+def test_verify_edits_and_diff():
+    formatter = ConfigFormatter(verify=True)
+    for config in CONFIGS:
+        assert formatter.prettify_edits(config) == ConfigFormatter().prettify_edits(config)
+    with pytest.raises(VerificationError, match="expected option 'key' with value 'value\\\\n"):
+        formatter.prettify_edits(ALTERED)
+    with pytest.raises(VerificationError):
+        formatter.prettify_diff(ALTERED)
+
+
+def test_verify_stops_at_first_difference():
+    config = "[section]\nkey = value\n\n# Comment.\n\n  continuation\n[other]\n" + "k = v\n" * 10
+    output = ConfigFormatter(verify=True).iter_prettify(config.splitlines(keepends=True))
+    with pytest.raises(VerificationError):
+        for line in output:
+            assert line != "[other]\n"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_invalid_configuration_errors_are_kept(engine: str):
+    formatter = ConfigFormatter(engine=engine, verify=True)
+    with pytest.raises(ParsingError):
+        formatter.prettify("[section]\ninvalid\n")
+    with pytest.raises(DuplicateOptionError):
+        formatter.prettify("[section]\nkey = 1\nkey = 2\n")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_verify_with_stats(engine: str):
+    stats = FormattingStats()
+    formatter = ConfigFormatter(engine=engine, stats=stats, verify=True)
+    assert formatter.prettify(CONFIGS[2]) == ConfigFormatter(engine=engine).prettify(CONFIGS[2])
+    assert "verify" in stats.timings
+    with pytest.raises(VerificationError):
+        formatter.prettify(ALTERED)
+    assert stats.configurations == 1
+
+
+def test_verify_many():
+    results = ConfigFormatter(verify=True).prettify_many([CONFIGS[1], ALTERED], workers=2)
+    assert results[0] == "[section]\nkey = value\n"
+    assert isinstance(results[1], VerificationError)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_verification_matches_configparser(generate_config, seed: int):
+    rng = random.Random(seed)
+    formatter = ConfigFormatter()
+    verifier = ConfigFormatter(verify=True)
+    for _ in range(200):
+        config = generate_config(rng)
+        try:
+            expected = formatter.prettify(config)
+            source = read(config)
+        except configparser.Error:
+            continue
+        try:
+            assert verifier.prettify(config) == expected
+        except VerificationError:
+            assert source != read(expected), config
+        else:
+            assert source == read(expected), config
+
+
+def read(config: str) -> dict:
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read_string("[top]\n" + config)
+    return {name: dict(parser[name]) for name in parser.sections()}
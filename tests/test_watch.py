@@ -0,0 +1,217 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+import config_formatter_cli
+from config_formatter import ConfigFormatter
+from config_formatter_cli import main
+
+UNFORMATTED = "[section]\nkey=value\n"
+FORMATTED = "[section]\nkey = value\n"
+
+WATCHERS = [config_formatter_cli._PollingWatcher]
+if sys.platform.startswith("linux"):
+    WATCHERS.append(config_formatter_cli._InotifyWatcher)
+
+requires_unix_sockets = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix sockets are not available"
+)
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def collect(watcher, count: int, timeout: float = 5.0) -> set:
+    changed = set()
+    deadline = time.monotonic() + timeout
+    while len(changed) < count and time.monotonic() < deadline:
+        changed.update(watcher.wait(0.1))
+    return changed
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "setup.cfg").write_text(UNFORMATTED)
+    (tmp_path / "README.md").write_text(UNFORMATTED)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "a.ini").write_text(UNFORMATTED)
+    return tmp_path
+
+
+@pytest.fixture
+def daemon():
+    threads = []
+
+    def start(*args, **kwargs):
+        stop = threading.Event()
+        kwargs["stop"] = stop
+        thread = threading.Thread(target=config_formatter_cli._run_daemon, args=args, kwargs=kwargs)
+        thread.start()
+        threads.append((thread, stop))
+        time.sleep(0.1)
+
+    yield start
+
+    for thread, stop in threads:
+        stop.set()
+        thread.join()
+
+
+@pytest.mark.parametrize("watcher_class", WATCHERS)
+def test_watcher_reports_modified_files(tree, watcher_class):
+    watcher = watcher_class([str(tree)])
+    try:
+        assert watcher.wait(0.1) == []
+        time.sleep(0.01)  # Make sure modification times differ.
+        (tree / "setup.cfg").write_text(FORMATTED)
+        (tree / "sub" / "a.ini").write_text(FORMATTED)
+        (tree / "README.md").write_text(FORMATTED)
+        expected = {str(tree / "setup.cfg"), str(tree / "sub" / "a.ini")}
+        assert collect(watcher, 2) == expected
+    finally:
+        watcher.close()
+
+
+@pytest.mark.parametrize("watcher_class", WATCHERS)
+def test_watcher_reports_new_files(tree, watcher_class):
+    watcher = watcher_class([str(tree)])
+    try:
+        (tree / "new").mkdir()
+        (tree / "new" / "b.cfg").write_text(UNFORMATTED)
+        (tree / ".hidden").mkdir()
+        (tree / ".hidden" / "c.cfg").write_text(UNFORMATTED)
+        assert collect(watcher, 1) == {str(tree / "new" / "b.cfg")}
+    finally:
+        watcher.close()
+
+
+@pytest.mark.parametrize("watcher_class", WATCHERS)
+def test_watcher_reports_explicit_files_whatever_their_name(tree, watcher_class):
+    path = str(tree / "README.md")
+    watcher = watcher_class([path])
+    try:
+        time.sleep(0.01)
+        (tree / "setup.cfg").write_text(FORMATTED)
+        temporary_path = tree / "README.md.tmp"
+        temporary_path.write_text(FORMATTED)
+        os.replace(str(temporary_path), path)
+        assert collect(watcher, 1) == {path}
+    finally:
+        watcher.close()
+
+
+def test_daemon_formats_changed_files(tree, daemon, capsys):
+    daemon(ConfigFormatter(), [str(tree)])
+    (tree / "sub" / "a.ini").write_text("[section]\nkey=other\n")
+    wait_for(lambda: (tree / "sub" / "a.ini").read_text() == "[section]\nkey = other\n")
+    assert (tree / "setup.cfg").read_text() == UNFORMATTED
+    assert (tree / "README.md").read_text() == UNFORMATTED
+
+
+def test_daemon_checks_changed_files(tree, daemon, capsys):
+    daemon(ConfigFormatter(), [str(tree)], check=True)
+    (tree / "sub" / "a.ini").write_text("[section]\nkey=other\n")
+    wait_for(lambda: "would reformat" in capsys.readouterr().err)
+    assert (tree / "sub" / "a.ini").read_text() == "[section]\nkey=other\n"
+
+
+@requires_unix_sockets
+def test_server(tree, daemon):
+    socket_path = str(tree / "server.sock")
+    daemon(ConfigFormatter(), [], socket_path=socket_path)
+
+    requests = [
+        {"content": UNFORMATTED},
+        {"content": "[section]\ninvalid\n"},
+        {"content": 1},
+        {"path": str(tree / "setup.cfg"), "check": True},
+        {"path": str(tree / "setup.cfg")},
+        {"path": str(tree / "missing.cfg")},
+        {"other": 1},
+        [],
+    ]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        with client.makefile("rwb") as stream:
+            for request in requests:
+                stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            stream.write(b"not json\n")
+            stream.flush()
+            responses = [json.loads(stream.readline()) for _ in range(len(requests) + 1)]
+
+    assert responses[0] == {"formatted": FORMATTED}
+    assert "Source contains parsing errors" in responses[1]["error"]
+    assert responses[2] == {"error": "The 'content' of the request must be a string"}
+    assert responses[3] == {"status": "reformatted", "message": "2"}
+    assert responses[4] == {"status": "reformatted", "message": None}
+    assert responses[5]["status"] == "error"
+    assert "either 'content' or 'path'" in responses[6]["error"]
+    assert responses[7] == {"error": "The request must be a JSON object"}
+    assert "error" in responses[8]
+    assert (tree / "setup.cfg").read_text() == FORMATTED
+
+
+@requires_unix_sockets
+def test_server_clients_are_concurrent(tree, daemon):
+    socket_path = str(tree / "server.sock")
+    daemon(ConfigFormatter(), [], socket_path=socket_path)
+    idle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    idle.connect(socket_path)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall(b'{"content": "[a]"}\n')
+            assert json.loads(client.makefile("rb").readline()) == {"formatted": "[a]\n"}
+    finally:
+        idle.close()
+
+
+@requires_unix_sockets
+def test_server_socket_removed_when_stopped(tree, daemon):
+    socket_path = str(tree / "server.sock")
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=config_formatter_cli._run_daemon,
+        args=(ConfigFormatter(), []),
+        kwargs={"socket_path": socket_path, "stop": stop},
+    )
+    thread.start()
+    wait_for(lambda: os.path.exists(socket_path))
+    stop.set()
+    thread.join()
+    assert not os.path.exists(socket_path)
+
+
+@requires_unix_sockets
+def test_server_replaces_stale_socket(tree, daemon):
+    socket_path = str(tree / "server.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    daemon(ConfigFormatter(), [], socket_path=socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+
+
+@requires_unix_sockets
+def test_server_socket_in_use(tree, daemon, capsys):
+    socket_path = str(tree / "server.sock")
+    daemon(ConfigFormatter(), [], socket_path=socket_path)
+    assert main(["--socket", socket_path]) == 1
+    assert f"error: cannot listen on {socket_path}" in capsys.readouterr().err
+
+
+def test_paths_required_without_socket(capsys):
+    with pytest.raises(SystemExit) as excinfo:
+        main([])
+    assert excinfo.value.code == 2
+    assert "the following arguments are required: PATH" in capsys.readouterr().err